@@ -0,0 +1 @@
+"""Benchmarks for asv (airspeed velocity), see asv.conf.json."""
@@ -0,0 +1,49 @@
+"""common.py.
+
+Synthetic data generators and parameter grids shared by the benchmarks.
+
+The default grid runs on a laptop: data over HOTELLING_BENCH_MAX_BYTES (default 2GB) is skipped. Set
+HOTELLING_BENCH_LARGE=1 to add 1e7 and 1e8 rows, and run dask inputs (generated lazily, one partition at a time) of
+any size.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+LARGE = os.environ.get("HOTELLING_BENCH_LARGE", "") not in ("", "0")
+MAX_BYTES = float(os.environ.get("HOTELLING_BENCH_MAX_BYTES", 2 * 1024 ** 3))
+
+ROWS = [1_000, 100_000, 1_000_000] + ([10_000_000, 100_000_000] if LARGE else [])
+FEATURES = [2, 20, 500]
+BACKENDS = ["numpy", "pandas", "dask"]
+PARTITION_BYTES = 64 * 1024 ** 2
+
+
+def check_size(n, p, backend, samples=2):
+    """Skip (asv skips a benchmark when setup raises NotImplementedError) data over MAX_BYTES, dask unless LARGE."""
+    if (backend != "dask" or not LARGE) and samples * n * p * 8 > MAX_BYTES:
+        raise NotImplementedError(f"{samples} x {n} x {p} {backend} over HOTELLING_BENCH_MAX_BYTES")
+
+
+def make_sample(n, p, backend="numpy", shift=0.0, seed=0):
+    """make_sample.
+
+    :param n: number of rows
+    :param p: number of features
+    :param backend: "numpy", "pandas" or "dask" (lazy, partitions of PARTITION_BYTES generated on compute)
+    :param shift: added to the mean of every feature
+    :param seed: random seed
+    :return: (n, p) normal sample, numpy array, pandas or dask dataframe
+    """
+    columns = [f"x{i}" for i in range(p)]
+    if backend == "dask":
+        import dask.array as da
+
+        rows = min(n, max(1, PARTITION_BYTES // (8 * p)))
+        values = da.random.RandomState(seed).standard_normal((n, p), chunks=(rows, p)) + shift
+        return values.to_dask_dataframe(columns=columns)
+    values = np.random.default_rng(seed).standard_normal((n, p)) + shift
+    if backend == "pandas":
+        return pd.DataFrame(values, columns=columns)
+    return values
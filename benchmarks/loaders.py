@@ -0,0 +1,68 @@
+"""loaders.py.
+
+Wall time and peak memory of `load_df` and `load_stats` for each file format. The files are written once by
+`setup_cache`, in a samples directory where asv runs the benchmarks.
+"""
+import os
+
+import numpy as np
+
+from hotelling.helpers import load_df, load_stats
+
+from .common import MAX_BYTES, ROWS, make_sample
+
+FORMATS = ["csv", "parquet", "feather", "npy"]
+FEATURES = [2, 20]
+
+
+def _path(directory, n, p, fmt):
+    """File of the (n, p) sample in a format."""
+    return os.path.join(directory, f"sample_{n}_{p}.{fmt}")
+
+
+class Loaders:
+    """Read a file of n rows and p features."""
+
+    params = (ROWS, FEATURES, FORMATS)
+    param_names = ["n", "p", "format"]
+    timeout = 900
+
+    def setup_cache(self):
+        """Write the samples in each format, up to MAX_BYTES, return the directory."""
+        directory = os.path.abspath("samples")
+        os.makedirs(directory, exist_ok=True)
+        for n in ROWS:
+            for p in FEATURES:
+                if n * p * 8 > MAX_BYTES:
+                    continue
+                df = make_sample(n, p, "pandas")
+                df.to_csv(_path(directory, n, p, "csv"), index=False)
+                df.to_parquet(_path(directory, n, p, "parquet"))
+                df.to_feather(_path(directory, n, p, "feather"), compression="uncompressed", chunksize=len(df))
+                np.save(_path(directory, n, p, "npy"), df.values)
+        return directory
+
+    def setup(self, directory, n, p, fmt):
+        """Skip the samples that were not written."""
+        if not os.path.exists(_path(directory, n, p, fmt)):
+            raise NotImplementedError(f"{n} x {p} over HOTELLING_BENCH_MAX_BYTES")
+
+    def time_load_df(self, directory, n, p, fmt):
+        """Time loading the dataframe."""
+        load_df(_path(directory, n, p, fmt))
+
+    def peakmem_load_df(self, directory, n, p, fmt):
+        """Peak memory of loading the dataframe."""
+        load_df(_path(directory, n, p, fmt))
+
+    def time_load_df_one_column(self, directory, n, p, fmt):
+        """Time loading a single column."""
+        load_df(_path(directory, n, p, fmt), columns=[0] if fmt == "npy" else ["x0"])
+
+    def time_load_stats(self, directory, n, p, fmt):
+        """Time streaming the file to SufficientStats."""
+        load_stats(_path(directory, n, p, fmt))
+
+    def peakmem_load_stats(self, directory, n, p, fmt):
+        """Peak memory of streaming the file to SufficientStats."""
+        load_stats(_path(directory, n, p, fmt))
@@ -0,0 +1,38 @@
+"""monitor.py.
+
+Per observation cost of the rolling window T2 of `hotelling.monitor.RollingT2`, against recomputing the mean and
+covariance factor of the window at each step.
+"""
+import numpy as np
+
+from hotelling.monitor import RollingT2
+
+from .common import make_sample
+
+STEPS = 200
+
+
+class Rolling:
+    """Score and push STEPS observations past a full window of p features."""
+
+    params = ([10, 50], [500, 2_000])
+    param_names = ["p", "window"]
+
+    def setup(self, p, window):
+        """Fill the window, generate the next observations."""
+        x = make_sample(window + STEPS, p, "numpy")
+        self.baseline, self.x = x[:window], x[window:]
+        self.rolling = RollingT2(window)
+        self.rolling.update(self.baseline)
+
+    def time_rolling_update(self, p, window):
+        """Time the rank-one update and refactorization of the window."""
+        self.rolling.update(self.x)
+
+    def time_recompute(self, p, window):
+        """Time recomputing the statistics of the window at each step, the baseline of `time_rolling_update`."""
+        values = np.vstack((self.baseline, self.x))
+        for i in range(STEPS):
+            window = values[i:i + self.baseline.shape[0]]
+            lower = np.linalg.cholesky(np.cov(window, rowvar=False))
+            np.linalg.solve(lower, values[i + window.shape[0]] - window.mean(0))
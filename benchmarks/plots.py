@@ -0,0 +1,58 @@
+"""plots.py.
+
+Wall time and peak memory of the control charts, without display, over the n x p grid and numpy, pandas and dask
+inputs.
+"""
+from hotelling.plots import control_chart, univariate_control_chart
+
+from .common import BACKENDS, ROWS, check_size, make_sample
+
+
+class ControlChart:
+    """Hotelling control chart of n rows."""
+
+    params = (ROWS, [2, 20, 500], [backend for backend in BACKENDS if backend != "numpy"])
+    param_names = ["n", "p", "backend"]
+    timeout = 600
+
+    def setup(self, n, p, backend):
+        """Generate the sample."""
+        check_size(n, p, backend, samples=1)
+        self.x = make_sample(n, p, backend)
+
+    def teardown(self, n, p, backend):
+        """Close the figures."""
+        import matplotlib.pyplot as plt
+
+        plt.close("all")
+
+    def time_control_chart(self, n, p, backend):
+        """Time the control chart."""
+        control_chart(self.x, no_display=True)
+
+    def peakmem_control_chart(self, n, p, backend):
+        """Peak memory of the control chart."""
+        control_chart(self.x, no_display=True)
+
+
+class UnivariateControlChart:
+    """Univariate control charts of n rows, one per feature."""
+
+    params = (ROWS, [2, 20], [backend for backend in BACKENDS if backend != "numpy"])
+    param_names = ["n", "p", "backend"]
+    timeout = 600
+
+    def setup(self, n, p, backend):
+        """Generate the sample."""
+        check_size(n, p, backend, samples=1)
+        self.x = make_sample(n, p, backend)
+
+    def teardown(self, n, p, backend):
+        """Close the figures."""
+        import matplotlib.pyplot as plt
+
+        plt.close("all")
+
+    def time_univariate_control_chart(self, n, p, backend):
+        """Time the univariate control charts."""
+        univariate_control_chart(self.x, no_display=True)
@@ -0,0 +1,34 @@
+"""startup.py.
+
+Startup time of the command line tool and of the modules, each measured in a fresh interpreter (asv timeraw), so
+a regression in the import time (a plotting or distributed backend imported at module level) shows up here.
+"""
+import subprocess
+import sys
+
+HEAVY_MODULES = ("matplotlib", "plotly", "dask", "distributed", "scipy.stats", "hotelling.plots")
+
+
+def timeraw_import_cli():
+    """Import the console script module, what every `hotelling` invocation pays before computing anything."""
+    return "import hotelling.cli"
+
+
+def timeraw_import_stats():
+    """Import the statistics module."""
+    return "import hotelling.stats"
+
+
+def timeraw_import_plots():
+    """Import the plots module, without drawing (matplotlib and plotly are imported on the first chart)."""
+    return "import hotelling.plots"
+
+
+def track_cli_heavy_modules():
+    """Count the plotting, distributed or scipy.stats modules imported by the console script module."""
+    code = "import sys, hotelling.cli; print(' '.join(sys.modules))"
+    modules = subprocess.run([sys.executable, "-c", code], capture_output=True, check=True).stdout.decode().split()
+    return sum(module.split(".")[0] in HEAVY_MODULES or module in HEAVY_MODULES for module in modules)
+
+
+track_cli_heavy_modules.unit = "modules"
@@ -0,0 +1,74 @@
+"""stats.py.
+
+Wall time and peak memory of the tests in `hotelling.stats`, over the n x p grid and numpy, pandas and dask inputs.
+"""
+from hotelling.stats import hotelling_t2, pooled_covariance_matrix
+
+from .common import BACKENDS, FEATURES, ROWS, check_size, make_sample
+
+
+class TwoSample:
+    """Two sample test, x and y of n rows."""
+
+    params = (ROWS, FEATURES, BACKENDS)
+    param_names = ["n", "p", "backend"]
+    timeout = 600
+
+    def setup(self, n, p, backend):
+        """Generate the samples."""
+        check_size(n, p, backend)
+        self.x = make_sample(n, p, backend, seed=0)
+        self.y = make_sample(n, p, backend, shift=0.01, seed=1)
+
+    def time_hotelling_t2(self, n, p, backend):
+        """Time the two sample test."""
+        hotelling_t2(self.x, self.y)
+
+    def peakmem_hotelling_t2(self, n, p, backend):
+        """Peak memory of the two sample test."""
+        hotelling_t2(self.x, self.y)
+
+    def time_pooled_covariance_matrix(self, n, p, backend):
+        """Time the pooled covariance matrix."""
+        pooled_covariance_matrix(self.x, self.y)
+
+
+class OneSample:
+    """One sample test against a mean of 0."""
+
+    params = (ROWS, FEATURES, BACKENDS)
+    param_names = ["n", "p", "backend"]
+    timeout = 600
+
+    def setup(self, n, p, backend):
+        """Generate the sample."""
+        check_size(n, p, backend, samples=1)
+        self.x = make_sample(n, p, backend)
+
+    def time_hotelling_t2(self, n, p, backend):
+        """Time the one sample test."""
+        hotelling_t2(self.x)
+
+    def peakmem_hotelling_t2(self, n, p, backend):
+        """Peak memory of the one sample test."""
+        hotelling_t2(self.x)
+
+
+class SmallSamples:
+    """Per call latency (microseconds) of the tests on small samples, the high call rate case of the numpy kernel."""
+
+    params = ([50, 200, 1_000], [2, 10], ["numpy", "pandas"])
+    param_names = ["n", "p", "backend"]
+
+    def setup(self, n, p, backend):
+        """Generate the samples."""
+        self.x = make_sample(n, p, backend, seed=0)
+        self.y = make_sample(n, p, backend, shift=0.1, seed=1)
+
+    def time_two_sample(self, n, p, backend):
+        """Time a two sample test."""
+        hotelling_t2(self.x, self.y)
+
+    def time_one_sample(self, n, p, backend):
+        """Time a one sample test."""
+        hotelling_t2(self.x)
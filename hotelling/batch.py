@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""batch.py.
+
+Run many Hotelling T2 tests from a manifest, in a pool of processes, each result reported as a compact JSON line as
+soon as its job finishes. This is what the `hotelling-batch` console script runs.
+
+A manifest is a csv file with columns x, y (optional) and id (optional), or a json file with a list of objects with
+the same keys (or an object with such a list under "jobs"). x and y are filenames or glob patterns: the files
+matched by x are paired in sorted order with the files matched by y, or all with the same y if it matches a
+single file. Without y, the one sample test is run against a mean of 0, as with the `hotelling` command.
+"""
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import csv
+import glob
+import json
+import math
+import os
+import time
+
+import numpy as np
+
+BACKENDS = ("pandas", "chunked", "dask")
+
+
+def _expand(pattern):
+    """Files matching a glob pattern, in sorted order, or the filename itself if it is not a pattern."""
+    if not glob.has_magic(pattern):
+        return [pattern]
+    return sorted(glob.glob(pattern))
+
+
+def read_manifest(filepath):
+    """read_manifest.
+
+    :param str filepath: csv or json manifest
+    :return: list of jobs, dict with id, x and y (None for the one sample test) filenames
+    """
+    if os.path.splitext(filepath)[1].lower() == ".json":
+        with open(filepath) as f:
+            entries = json.load(f)
+        if isinstance(entries, dict):
+            entries = entries["jobs"]
+    else:
+        with open(filepath, newline="") as f:
+            entries = list(csv.DictReader(f))
+    jobs = []
+    for entry in entries:
+        xs = _expand(entry["x"])
+        ys = [None] * len(xs) if not entry.get("y") else _expand(entry["y"])
+        if len(ys) == 1 and len(xs) > 1:
+            ys = ys * len(xs)
+        if len(xs) != len(ys):
+            raise ValueError(f"Error: {entry['x']} matches {len(xs)} files, {entry['y']} matches {len(ys)}.")
+        job_id = entry.get("id") or None
+        for x, y in zip(xs, ys):
+            if job_id is None:
+                name = x
+            elif len(xs) > 1:
+                name = f"{job_id}/{os.path.basename(x)}"
+            else:
+                name = job_id
+            jobs.append(dict(id=str(name), x=x, y=y))
+    return jobs
+
+
+def _finite(value):
+    """JSON friendly float, None for nan and infinities."""
+    value = float(value)
+    return value if math.isfinite(value) else None
+
+
+def run_job(job, backend="pandas", chunksize=None, cov=True):
+    """run_job.
+
+    :param dict job: id, x and y filenames, see `read_manifest`
+    :param str backend: "pandas" to load the files in memory, "chunked" to stream them in chunks (see
+        `hotelling.helpers.load_stats`) or "dask"
+    :param int chunksize: number of rows per chunk, for the chunked backend
+    :param bool cov: include the pooled covariance matrix (and its columns)
+    :return: dict, the job with t2_stat, f_stat, p_value, (columns, pooled_var), seconds, or error
+    """
+    from hotelling.helpers import load_df, stream_hotelling_dict
+    from hotelling.stats import CHUNKSIZE, hotelling_dict
+
+    start = time.perf_counter()
+    record = dict(job)
+    try:
+        if backend == "chunked":
+            res = stream_hotelling_dict(job["x"], job["y"], chunksize=chunksize or CHUNKSIZE)
+            columns = getattr(res["pooled_var"], "columns", None)
+        else:
+            dask = backend == "dask"
+            x = load_df(job["x"], dask=dask)
+            y = None if job["y"] is None else load_df(job["y"], dask=dask)
+            res = hotelling_dict(x, y)
+            columns = x.columns
+        record.update(t2_stat=_finite(res["t2_stat"]), f_stat=_finite(res["f_stat"]), p_value=_finite(res["p_value"]))
+        if cov:
+            s = res["pooled_var"]
+            if columns is not None:
+                record["columns"] = [str(col) for col in columns]
+            record["pooled_var"] = [[_finite(v) for v in row] for row in np.asarray(s, dtype=float)]
+    except Exception as ex:  # report the failure of this job, and carry on with the others
+        record["error"] = f"{type(ex).__name__}: {ex}"
+    record["seconds"] = round(time.perf_counter() - start, 6)
+    return record
+
+
+def run_batch(jobs, backend="pandas", chunksize=None, cov=True, workers=None):
+    """run_batch.
+
+    :param list jobs: see `read_manifest`
+    :param str backend: "pandas", "chunked" or "dask", see `run_job`
+    :param int chunksize: number of rows per chunk, for the chunked backend
+    :param bool cov: include the pooled covariance matrix in the results
+    :param int workers: number of processes, defaults to the number of cpus, 1 to run the jobs in this process
+    :return: generator of results, in order of completion
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Error: backend must be one of {BACKENDS}, not {backend}.")
+    if workers is None:
+        from hotelling.parallel import cpu_count
+
+        workers = cpu_count()
+    if workers < 2 or len(jobs) < 2:
+        for job in jobs:
+            yield run_job(job, backend, chunksize, cov)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(run_job, job, backend, chunksize, cov) for job in jobs]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def to_json_line(record):
+    """Compact JSON representation of a result, on one line."""
+    return json.dumps(record, separators=(",", ":"))
@@ -4,14 +4,9 @@
 import sys
 import click
 import pandas as pd
-import matplotlib
-from matplotlib import pyplot as plt
 
 from hotelling.stats import hotelling_dict
-from hotelling.plots import control_chart
-from hotelling.helpers import savefig
-
-matplotlib.rcParams["backend"] = "Agg"
+from hotelling.helpers import stream_hotelling_dict
 
 
 @click.command()
@@ -19,14 +14,27 @@ matplotlib.rcParams["backend"] = "Agg"
 @click.option("--y", help="Dataset Y filename.")
 @click.option("--chart", help="Display control chart.", default=False)
 @click.option("--output", help="filename or stdout")
-def main(x, y=None, chart=None, output=None):
+@click.option("--chunksize", type=int, help="Stream the csv files in chunks of this many rows (large files).")
+def main(x, y=None, chart=None, output=None, chunksize=None):
     """Console script for hotelling."""
+    if chunksize and not chart:
+        print(stream_hotelling_dict(x, y, chunksize=chunksize))
+        return
     df1 = pd.read_csv(x)
     if y is None:
         df2 = None
     else:
         df2 = pd.read_csv(y)
     if chart:
+        # matplotlib is only needed (and imported) for charts
+        import matplotlib
+
+        matplotlib.rcParams["backend"] = "Agg"
+        from matplotlib import pyplot as plt
+
+        from hotelling.helpers import savefig
+        from hotelling.plots import control_chart
+
         ax = control_chart(df1)
         if output == "stdout":
             savefig(plt)
@@ -37,5 +45,37 @@ def main(x, y=None, chart=None, output=None):
         print(res)
 
 
+@click.command()
+@click.argument("manifest", type=click.Path(exists=True, dir_okay=False))
+@click.option("--workers", type=int, help="Number of processes, defaults to the number of cpus.")
+@click.option(
+    "--backend", type=click.Choice(["pandas", "chunked", "dask"]), default="pandas", show_default=True,
+    help="Load the files in memory, stream them in chunks, or use dask.",
+)
+@click.option("--chunksize", type=int, help="Rows per chunk, for the chunked backend.")
+@click.option("--no-cov", is_flag=True, help="Omit the pooled covariance matrix from the results.")
+@click.option("--output", help="JSON lines filename, defaults to stdout.")
+def batch(manifest, workers=None, backend="pandas", chunksize=None, no_cov=False, output=None):
+    """Run the tests listed in a csv or json MANIFEST (x and y filenames or glob patterns, optional id).
+
+    Each result is written as one JSON line as soon as its job finishes.
+    """
+    from hotelling.batch import read_manifest, run_batch, to_json_line
+
+    jobs = read_manifest(manifest)
+    out = sys.stdout if output is None else open(output, "w")
+    errors = 0
+    try:
+        for record in run_batch(jobs, backend, chunksize, not no_cov, workers):
+            errors += "error" in record
+            out.write(to_json_line(record) + "\n")
+            out.flush()
+    finally:
+        if output is not None:
+            out.close()
+    if errors:
+        sys.exit(1)
+
+
 if __name__ == "__main__":
     sys.exit(main())  # pragma: no cover
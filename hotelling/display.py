@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+"""display.py.
+
+Reduction of long series of T2 values (one per observation) to the few thousand points a chart can show, keeping
+their shape and every out of control point, instead of a random sample of the observations.
+
+  - min / max decimation: the lowest and highest point of each bucket of consecutive observations, precomputed at
+    several bucket sizes (`DisplayLevels`) so that zooming on any range of rows is fast, even over 100M points.
+  - LTTB, largest triangle three buckets: one point per bucket, the one forming the largest triangle with the
+    points kept in the previous and next buckets, closest to the visual shape of the line.
+
+See:
+  - Steinarsson, S. (2013). Downsampling Time Series for Visual Representation. MSc thesis, University of Iceland.
+"""
+import numpy as np
+
+BUCKET = 4  # observations per bucket of the finest min / max level
+FACTOR = 4  # buckets merged in each bucket of the next level
+DISPLAY_METHODS = ("minmax", "lttb", "random")
+
+
+def _extremes(values, size):
+    """Positions of the minimum and of the maximum of each bucket of `size` consecutive values."""
+    n = values.shape[0]
+    full = n - n % size
+    blocks = values[:full].reshape(-1, size)
+    offsets = np.arange(0, full, size)
+    lo, hi = offsets + blocks.argmin(1), offsets + blocks.argmax(1)
+    if full < n:
+        lo = np.append(lo, full + values[full:].argmin())
+        hi = np.append(hi, full + values[full:].argmax())
+    return lo, hi
+
+
+def _merge(values, positions, factor, pick):
+    """Merge groups of `factor` consecutive buckets, keeping the position picked (argmin / argmax) in each."""
+    pad = -positions.shape[0] % factor
+    if pad:
+        positions = np.append(positions, np.repeat(positions[-1], pad))
+    groups = positions.reshape(-1, factor)
+    return groups[np.arange(groups.shape[0]), pick(values[groups], axis=1)]
+
+
+def minmax_indices(values, limit):
+    """minmax_indices.
+
+    :param values: 1d array
+    :param limit: max number of points
+    :return: sorted positions of the minimum and maximum of limit / 2 buckets of consecutive values, all of them if
+        there are no more than limit values
+    """
+    values = np.asarray(values, dtype=float)
+    n = values.shape[0]
+    if n <= limit:
+        return np.arange(n)
+    size = -(-2 * n // max(limit, 2))
+    return np.unique(np.concatenate(_extremes(values, size)))
+
+
+def lttb_indices(values, limit):
+    """lttb_indices.
+
+    Largest triangle three buckets: the first and last values, and in each of limit - 2 buckets, the value forming the
+    largest triangle with the previously kept value and the average of the next bucket.
+
+    :param values: 1d array
+    :param limit: max number of points, at least 3
+    :return: sorted positions of the kept values, all of them if there are no more than limit values
+    """
+    values = np.asarray(values, dtype=float)
+    n = values.shape[0]
+    if n <= limit or limit < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, limit - 1).astype(int)
+    edges = np.append(edges, n)
+    kept = np.empty(limit, dtype=int)
+    kept[0], kept[-1] = 0, n - 1
+    previous = 0
+    for i in range(limit - 2):
+        start, stop, next_stop = edges[i], edges[i + 1], edges[i + 2]
+        next_x = (edges[i + 1] + next_stop - 1) / 2
+        next_y = values[edges[i + 1]:next_stop].mean()
+        xs = np.arange(start, stop)
+        areas = np.abs(
+            (previous - next_x) * (values[start:stop] - values[previous])
+            - (previous - xs) * (next_y - values[previous])
+        )
+        previous = kept[i + 1] = start + int(np.argmax(areas))
+    return kept
+
+
+class DisplayLevels:
+    """DisplayLevels.
+
+    T2 values of all the observations, with their out of control positions and min / max decimation levels of
+    buckets of BUCKET, BUCKET * FACTOR, BUCKET * FACTOR² ... observations, built on first use, to select the points
+    to display for any range of rows in time proportional to the number of points, not of rows.
+
+    :param scores: 1d array, T2 value of each observation, see `hotelling.stats.hotelling_t2_scores`
+    :param lcl: lower control limit (optional)
+    :param cl: center line (optional)
+    :param ucl: upper control limit (optional)
+    :param f: number of features (optional)
+    """
+
+    def __init__(self, scores, lcl=None, cl=None, ucl=None, f=None):
+        """Find the out of control observations."""
+        self.scores = np.asarray(scores, dtype=float)
+        self.lcl, self.cl, self.ucl, self.f = lcl, cl, ucl, f
+        out = np.zeros(self.scores.shape[0], dtype=bool)
+        if ucl is not None:
+            out |= self.scores > ucl
+        if lcl is not None:
+            out |= self.scores < lcl
+        self.outliers = np.flatnonzero(out)
+        self._levels = None
+
+    def __len__(self):
+        """Return the number of observations."""
+        return self.scores.shape[0]
+
+    @property
+    def levels(self):
+        """List of (bucket size, positions of the minima, positions of the maxima), finest first."""
+        if self._levels is None:
+            size = BUCKET
+            lo, hi = _extremes(self.scores, size)
+            self._levels = [(size, lo, hi)]
+            while lo.shape[0] > FACTOR:
+                size *= FACTOR
+                lo, hi = _merge(self.scores, lo, FACTOR, np.argmin), _merge(self.scores, hi, FACTOR, np.argmax)
+                self._levels.append((size, lo, hi))
+        return self._levels
+
+    def _minmax(self, start, stop, limit):
+        """Min / max positions in [start, stop) from the finest level with at most limit / 2 buckets."""
+        count = stop - start
+        for size, lo, hi in self.levels:
+            if count <= size * max(limit // 2, 1):
+                break
+        first, last = start // size, -(-stop // size)
+        kept = np.concatenate((lo[first:last], hi[first:last]))
+        return kept[(kept >= start) & (kept < stop)]
+
+    def view(self, start=None, stop=None, limit=1000, method="minmax", random_state=None):
+        """view.
+
+        :param start: first row of the range (optional, default to the first observation)
+        :param stop: end of the range, excluded (optional, default to all the observations)
+        :param limit: max number of points, besides the out of control points
+        :param method: "minmax" (default), "lttb", or "random" for a random sample of the rows
+        :param random_state: seed for method="random"
+        :return: sorted positions of the points to display, including every out of control point of the range
+        """
+        if method not in DISPLAY_METHODS:
+            raise ValueError(f"Error: method must be one of {DISPLAY_METHODS}, not {method}.")
+        start, stop, _ = slice(start, stop).indices(len(self))
+        stop = max(start, stop)
+        if stop - start <= limit:
+            return np.arange(start, stop)
+        if method == "minmax":
+            kept = self._minmax(start, stop, limit)
+        elif method == "lttb":
+            kept = start + lttb_indices(self.scores[start:stop], limit)
+        else:
+            kept = start + np.random.default_rng(random_state).choice(stop - start, limit, replace=False)
+        outliers = self.outliers[np.searchsorted(self.outliers, start):np.searchsorted(self.outliers, stop)]
+        return np.union1d(kept, outliers)
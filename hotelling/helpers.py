@@ -1,17 +1,89 @@
 """helpers.py."""
+import atexit
 from io import BytesIO
+import logging
 import os
 from warnings import warn
+import numpy as np
 import pandas as pd
 
-try:
-    import dask.dataframe as dd
-except ImportError:
-    dd = False
-try:
-    import sixel
-except ImportError:
-    sixel = None
+from hotelling.profiling import profiled, stage
+from hotelling.stats import CHUNKSIZE, SufficientStats, hotelling_t2
+
+logger = logging.getLogger(__name__)
+
+# distributed clients by server address: (client, created here and to be closed on exit)
+_clients = {}
+# clients created by `get_client` and replaced by `register_client`, still closed on exit
+_replaced = []
+
+
+def get_client(server="localhost"):
+    """get_client.
+
+    Distributed client for a server, reused as long as it is running, so a session (or the x and y samples of a
+    test) pays the connection, or the startup of a local cluster, only once. Clients created here are closed on exit.
+
+    :param str server: head node for distributed cluster, ip address and port or hostname and port (localhost for a
+        local cluster)
+    :return: distributed.Client
+    """
+    client, owned = _clients.get(server, (None, False))
+    if client is not None and client.status == "running":
+        return client
+    if owned and client.status != "closed":
+        client.close()  # not running anymore, release its local cluster before replacing it
+    from distributed import Client
+
+    client = Client() if server == "localhost" else Client(server)
+    _clients[server] = (client, True)
+    logger.info("distributed client for %s, threads per worker: %s", server, client.nthreads())
+    return client
+
+
+def register_client(client, server=None):
+    """register_client.
+
+    Use an existing distributed client for a server (by default, its scheduler address), instead of creating one.
+    It is not closed by `close_clients`, its owner is responsible for it. A client created by `get_client` for the
+    same server is still closed on exit, registering it again leaves it owned.
+
+    :param client: distributed.Client
+    :param str server: server address to use the client for (optional)
+    :return: the client
+    """
+    server = server or client.scheduler.address
+    previous, owned = _clients.get(server, (None, False))
+    if previous is client:
+        return client
+    if owned:
+        _replaced.append(previous)
+    _clients[server] = (client, False)
+    return client
+
+
+@atexit.register
+def close_clients():
+    """close_clients.
+
+    Close the distributed clients created by `get_client` (and the local clusters they started), forget all clients.
+    """
+    owned_clients = [(server, client) for server, (client, owned) in _clients.items() if owned]
+    for server, client in owned_clients + [(None, client) for client in _replaced]:
+        if client.status != "closed":
+            logger.info("closing distributed client for %s", server)
+            client.close()
+    _clients.clear()
+    _replaced.clear()
+
+
+def _dask_dataframe():
+    """Import dask.dataframe on first use (it is slow to import), False if dask is not available."""
+    try:
+        import dask.dataframe as dd
+    except ImportError:
+        dd = False
+    return dd
 
 
 def savefig(plt):
@@ -26,6 +98,10 @@ def savefig(plt):
     :param plt: matplotlib pyplot
     :return:
     """
+    try:
+        import sixel
+    except ImportError:
+        sixel = None
     buf = BytesIO()
     plt.savefig(buf)
     buf.seek(0)
@@ -35,19 +111,154 @@ def savefig(plt):
     writer.draw(buf)
 
 
-def load_df(filepath, server=None, dask=None, **kwargs):
+FORMATS = {
+    ".parquet": "parquet",
+    ".pq": "parquet",
+    ".feather": "arrow",
+    ".arrow": "arrow",
+    ".ipc": "arrow",
+    ".npy": "npy",
+}
+SNIFF_ROWS = 1000  # first rows of a csv file read to find its floating point columns, see `load_df` dtype
+
+
+def file_format(filepath):
+    """file_format.
+
+    :param str filepath: file, or directory of parquet files
+    :return: "parquet", "arrow" (feather / arrow ipc file), "npy" or "csv", from the extension
+    """
+    path = str(filepath).rstrip("/")
+    if os.path.isdir(path):
+        return "parquet"
+    return FORMATS.get(os.path.splitext(path)[1].lower(), "csv")
+
+
+def _file_size(filepath):
+    """Size in bytes of a file, or of all the files under a directory (parquet dataset)."""
+    if not os.path.isdir(filepath):
+        return os.stat(filepath).st_size
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(filepath) for name in names)
+
+
+def _cast_table(table, dtype):
+    """Cast the floating point columns of an arrow table to dtype, before any conversion to pandas."""
+    import pyarrow as pa
+
+    if dtype is None:
+        return table
+    target = pa.from_numpy_dtype(np.dtype(dtype))
+    fields = [field.with_type(target) if pa.types.is_floating(field.type) else field for field in table.schema]
+    return table.cast(pa.schema(fields, metadata=table.schema.metadata))
+
+
+def _read_arrow(filepath, columns=None, dtype=None):
+    """Read a feather / arrow ipc file memory mapped, as a pandas dataframe.
+
+    The dataframe views the mapped buffers only if the file is uncompressed and holds a single record batch, pandas
+    needs contiguous columns: the columns of a file of several batches are concatenated, a copy. With a dtype, the
+    floating point columns are cast from the mapped buffers, the only copy.
+    """
+    from pyarrow import feather
+
+    table = feather.read_table(filepath, memory_map=True)
+    if columns is not None:
+        # projection after mapping, read_table(columns=...) copies the selected columns
+        table = table.select(list(columns))
+    return _cast_table(table, dtype).to_pandas(split_blocks=True)
+
+
+def _read_parquet(filepath, columns=None, dtype=None, **kwargs):
+    """Read a parquet file (or directory) with pyarrow, casting the floating point columns to dtype in arrow."""
+    from pyarrow import parquet
+
+    table = parquet.read_table(filepath, columns=columns, use_pandas_metadata=True, **kwargs)
+    return _cast_table(table, dtype).to_pandas()
+
+
+def _read_csv(data_frame, filepath, dtype=None, **kwargs):
+    """Read a csv file with pandas or dask, parsing the floating point columns of the first rows straight to dtype."""
+    if dtype is None:
+        return data_frame.read_csv(filepath, **kwargs)
+    try:
+        head = pd.read_csv(filepath, nrows=SNIFF_ROWS, **kwargs)
+    except (OSError, TypeError, ValueError):
+        return data_frame.read_csv(filepath, **kwargs)
+    floats = {col: dtype for col in head.select_dtypes("floating").columns}
+    try:
+        return data_frame.read_csv(filepath, dtype=floats, **kwargs)
+    except ValueError:
+        # not a number past the first rows, read as is
+        return data_frame.read_csv(filepath, **kwargs)
+
+
+def _read_npy(filepath, columns=None):
+    """Read a 2d .npy file memory mapped, as a pandas dataframe viewing the mapped array (integer column names)."""
+    values = np.load(filepath, mmap_mode="r")
+    if values.ndim == 1:
+        values = values.reshape(-1, 1)
+    p = values.shape[1]
+    labels = range(p)
+    if columns is not None:
+        if any(not -p <= col < p for col in columns):
+            raise ValueError(f"Error: the columns of a .npy file are positions between {-p} and {p - 1}, not {columns}.")
+        labels = [col % p for col in columns]  # negative positions from the end
+        if labels and labels == list(range(labels[0], labels[-1] + 1)):
+            values = values[:, labels[0]:labels[-1] + 1]  # contiguous range, still a view
+        else:
+            values = values[:, labels]
+    return pd.DataFrame(values, columns=labels, copy=False)
+
+
+def _use_columns(columns, kwargs):
+    """Project the csv columns with read_csv usecols, keeping the index column."""
+    index_col = kwargs.get("index_col")
+    kwargs["usecols"] = list(columns) + ([] if index_col is None or index_col in columns else [index_col])
+
+
+def _cast(df, dtype):
+    """Cast the floating point columns of a pandas or dask dataframe to dtype, if they are not already."""
+    if dtype is None:
+        return df
+    floats = [col for col in df.select_dtypes("floating").columns if df[col].dtype != np.dtype(dtype)]
+    if not floats:
+        return df
+    return df.astype({col: dtype for col in floats})
+
+
+@profiled("load_df")
+def load_df(filepath, server=None, dask=None, columns=None, client=None, dtype=None, **kwargs):
     """load_df.
 
+    The format is detected from the extension: parquet (.parquet, .pq or a directory), feather / arrow ipc (.feather,
+    .arrow, .ipc), numpy (.npy) and csv for anything else. Only the requested columns are read from disk. Arrow and
+    .npy files are memory mapped, so loading is not a parse nor a copy: the dataframe views the mapped file. For this,
+    arrow files have to be written uncompressed, as a single record batch (by default, feather files are split in
+    batches of 64K rows), `df.to_feather(path, compression="uncompressed", chunksize=len(df))`.
+
+    Dask is used for csv and parquet files over 2GB (or with dask=True or a server). Memory mapped formats
+    don't need it to handle large files, and only use dask when it is requested.
+
+    Reading parquet and arrow files requires the optional `pyarrow` module.
+
     :param str filepath:
     :param str server: head node for distributed cluster, ip address and port or hostname and port (localhost for local)
+        the client is reused by the following calls, see `get_client`
     :param bool dask: if True, forces the use of dask,, even on smaller datasets
-    :param kwargs: to pass arguments to pandas `read_csv`
+    :param list columns: feature columns to read (optional), integer positions for .npy files (negative from the end)
+    :param client: existing distributed.Client to use (optional), instead of server
+    :param dtype: dtype of the floating point columns (optional), for example np.float32 to halve memory, see the
+        dtype option of `hotelling.stats.hotelling_t2`. The columns are converted while reading: csv columns with
+        floating point values in the first rows are parsed as dtype, parquet (with pandas) and arrow columns are cast
+        in arrow, before the conversion to pandas. Other columns (and dask parquet partitions) are cast after reading.
+        Memory mapped files are copied when cast.
+    :param kwargs: to pass arguments to pandas (or dask) `read_csv` / `read_parquet`
 
     :return: dataframe
     """
+    fmt = file_format(filepath)
     try:
-        statinfo = os.stat(filepath)  # file could be on hdfs or s3
-        filesize = statinfo.st_size
+        filesize = _file_size(filepath)  # file could be on hdfs or s3
         if filesize > 2 * 1024 ** 3:  # 2GB, consider large
             large = True
         else:
@@ -57,10 +268,22 @@ def load_df(filepath, server=None, dask=None, **kwargs):
         filesize = 0
         large = True
 
+    if client is not None:
+        server = server or client.scheduler.address
+        register_client(client, server)
     if server:
         large = True  # force it when server is specified
 
+    if fmt in ("arrow", "npy"):
+        large = dask or server  # memory mapped, dask only on request
+
+    if columns is not None and fmt == "csv":
+        _use_columns(columns, kwargs)
+
     set_index = None
+    if fmt != "csv" and "index_col" in kwargs.keys():
+        set_index = kwargs.pop("index_col")
+    dd = _dask_dataframe() if large else False
     if dd and large:  # dask is available
         data_frame = dd
         if "index_col" in kwargs.keys():
@@ -68,17 +291,107 @@ def load_df(filepath, server=None, dask=None, **kwargs):
             index_col = kwargs.pop("index_col")
             set_index = index_col
         if server:
-            from distributed import Client
-
-            if server == "localhost":
-                client = Client()  # "distributed", local
-            else:
-                client = Client(server)  # distributed, head node
-            print(client.ncores())
+            get_client(server)  # "distributed", local or head node, reused across calls
     else:
         data_frame = pd
-    if set_index:
-        df = data_frame.read_csv(filepath, **kwargs).set_index(index_col, sorted=True, drop=True)
-    else:
-        df = data_frame.read_csv(filepath, **kwargs)
+    with stage("read") as read:
+        if fmt == "parquet":
+            if set_index is not None and columns is not None and set_index not in columns:
+                columns = list(columns) + [set_index]
+            if dtype is not None and data_frame is pd and "engine" not in kwargs:
+                df = _read_parquet(filepath, columns, dtype, **kwargs)
+            else:
+                df = data_frame.read_parquet(filepath, columns=columns, **kwargs)
+        elif fmt in ("arrow", "npy"):
+            df = _read_arrow(filepath, columns, dtype) if fmt == "arrow" else _read_npy(filepath, columns)
+            if data_frame is not pd:
+                df = dd.from_pandas(df, chunksize=CHUNKSIZE)
+        else:
+            df = _read_csv(data_frame, filepath, dtype, **kwargs)
+        df = _cast(df, dtype)  # fallback, for the columns not converted while reading
+        read.data(df)
+    if set_index is not None:
+        if data_frame is pd:
+            df = df.set_index(set_index, drop=True)
+        else:
+            df = df.set_index(set_index, sorted=True, drop=True)
     return df
+
+
+def _parquet_batches(filepath, chunksize, columns=None, index_col=None):
+    """Record batches of a parquet file (or directory), as pandas dataframes of at most chunksize rows."""
+    from pyarrow import dataset
+
+    source = dataset.dataset(filepath, format="parquet")
+    if columns is None:
+        columns = [
+            name for name in source.schema.names if not name.startswith("__index_level_") and name != index_col
+        ]
+    for batch in source.to_batches(columns=list(columns), batch_size=chunksize):
+        yield batch.to_pandas()
+
+
+def load_stats(filepath, chunksize=CHUNKSIZE, columns=None, **kwargs):
+    """load_stats.
+
+    Streaming alternative to `load_df` for datasets too large for memory, without requiring dask. The file is read
+    in blocks of `chunksize` rows, with pandas `read_csv` or as parquet record batches, and each block is folded into
+    a `SufficientStats` accumulator, so only one block is held in memory at any time. Arrow and .npy files are
+    memory mapped (see `load_df`) and accumulated in blocks of the mapped file.
+
+    :param str filepath:
+    :param int chunksize: number of rows per block
+    :param list columns: feature columns to read (optional)
+    :param kwargs: to pass arguments to pandas `read_csv`
+    :return: SufficientStats
+    """
+    fmt = file_format(filepath)
+    if fmt in ("arrow", "npy"):
+        return SufficientStats.from_data(load_df(filepath, columns=columns, **kwargs), chunksize)
+    if fmt == "parquet":
+        chunks = _parquet_batches(filepath, chunksize, columns, kwargs.get("index_col"))
+    else:
+        if columns is not None:
+            _use_columns(columns, kwargs)
+        chunks = pd.read_csv(filepath, chunksize=chunksize, **kwargs)
+    acc = SufficientStats()
+    for chunk in chunks:
+        if acc.columns is None:
+            acc.columns = list(chunk.columns)
+        acc.update(chunk)
+    return acc
+
+
+def stream_hotelling_t2(x, y=None, bessel=True, chunksize=CHUNKSIZE, **kwargs):
+    """stream_hotelling_t2.
+
+    Same results as `hotelling_t2`, but streaming the csv files through `load_stats`, with memory use depending on
+    chunksize and the number of features, not on the size of the files.
+
+    :param str x: filename of the samples of observations for one or two sample test (required)
+    :param y: for two sample test, filename of the samples of observations (optional), for one sample, list of means
+    :param bessel: bool, apply bessel correction (default)
+    :param int chunksize: number of rows per block
+    :param kwargs: to pass arguments to pandas `read_csv`
+    :return: t2 statistic, f value, p value, pooled variance
+    """
+    x_stats = load_stats(x, chunksize, **kwargs)
+    if isinstance(y, (str, os.PathLike)):
+        y = load_stats(y, chunksize, **kwargs)
+    return hotelling_t2(x_stats, y, bessel)
+
+
+def stream_hotelling_dict(x, y=None, bessel=True, chunksize=CHUNKSIZE, **kwargs):
+    """stream_hotelling_dict.
+
+    returns the same values as `stream_hotelling_t2`, but in a dictionary, like `hotelling_dict`
+
+    :param str x: filename of the samples of observations for one or two sample test (required)
+    :param y: for two sample test, filename of the samples of observations (optional), for one sample, list of means
+    :param bessel: bool, apply bessel correction (default)
+    :param int chunksize: number of rows per block
+    :param kwargs: to pass arguments to pandas `read_csv`
+    :return: dict
+    """
+    t2_stat, f_stat, p_value, s = stream_hotelling_t2(x, y, bessel, chunksize, **kwargs)
+    return dict(t2_stat=t2_stat, f_stat=f_stat, p_value=p_value, pooled_var=s)
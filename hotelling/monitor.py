@@ -0,0 +1,435 @@
+# -*- coding: utf-8 -*-
+"""monitor.py.
+
+Online (phase 2) Hotelling's T-Squared monitoring of new observations against a fixed baseline, without plotting.
+
+See:
+  - Nola D. Tracy, John C. Young & Robert L. Mason (1992) Multivariate Control Charts for individual Observations,
+    Journal or Quality Technology, 24:2, 88-95, DOI:10.1080/00224065.1992.12015232
+  - Lowry, C.A., Woodall, W.H., Champ, C.W. & Rigdon, S.E. (1992). A Multivariate Exponentially Weighted Moving
+    Average Control Chart. Technometrics, 34:1, 46-53, DOI:10.2307/1269551
+"""
+from collections import deque
+from functools import lru_cache
+import math
+
+import numpy as np
+from scipy.linalg.lapack import dpotrf
+from scipy.signal import lfilter
+
+from hotelling.plots import control_interval, control_stats
+from hotelling.stats import CHUNKSIZE, CovarianceFactor, _iter_chunks, factorize
+
+SIMULATION_CELLS = 2 ** 22  # max number of simulated values per block, when calibrating limits by simulation
+
+
+class T2Monitor:
+    """T2Monitor.
+
+    Scores new observations against a phase 1 baseline (mean vector and covariance matrix). The covariance is
+    factorized and the phase 2 control limits are computed once, at construction, so each call to `score` only
+    costs O(p²) per observation.
+
+    :param x_bar: baseline sample mean (p)
+    :param s: baseline sample covariance (p, p), or CovarianceFactor
+    :param m: number of observations in the baseline
+    :param alpha: significance level - used to calculate control lines at α/2 and 1-α/2
+    """
+
+    def __init__(self, x_bar, s, m, alpha=0.001):
+        """Initialize from the baseline statistics."""
+        self.x_bar = np.asarray(x_bar, dtype=float).ravel()
+        self.p = self.x_bar.shape[0]
+        self.m = m
+        self.alpha = alpha
+        self.lcl, self.cl, self.ucl = control_interval(m, m, self.p, phase=2, alpha=alpha)
+        self.factor = factorize(s)
+
+    @classmethod
+    def from_baseline(cls, x, alpha=0.001):
+        """from_baseline.
+
+        Build the monitor from the phase 1 observations, using `control_stats`.
+
+        :param x: pandas or dask dataframe, phase 1 observations
+        :param alpha: significance level - used to calculate control lines at α/2 and 1-α/2
+        :return: T2Monitor
+        """
+        n = x.shape[0]
+        try:
+            n = n.compute()
+        except AttributeError:
+            pass
+        x_bar, s = control_stats(x)
+        return cls(x_bar, s, n, alpha=alpha)
+
+    def score(self, batch):
+        """score.
+
+        :param batch: one observation (p) or a batch of observations (k, p), array-like
+        :return: T2 values (k), out of control flags (k)
+        """
+        batch = np.asarray(batch, dtype=float)
+        if batch.ndim == 1:
+            batch = batch.reshape(1, -1)
+        t2 = self.factor.mahalanobis(batch - self.x_bar)
+        return t2, (t2 > self.ucl) | (t2 < self.lcl)
+
+
+class RollingT2:
+    """RollingT2.
+
+    Phase 2 T2 monitoring against a rolling baseline made of the last `window` observations. Each new observation is
+    scored against the current window, then enters it while the oldest observation leaves. The running mean and
+    co-moment matrix are maintained with a rank-one update and a rank-one downdate, O(p²), and the co-moment matrix
+    is refactorized by LAPACK, O(p³) with a small constant, instead of recomputing the statistics of the window,
+    O(window p² + p³). (Updating the Cholesky factor with rotations is O(p²), but as a Python loop over the columns,
+    it is slower than the LAPACK factorization up to about a thousand features.)
+
+    A window with a constant or collinear feature has a singular co-moment matrix, the observations are then scored
+    with the eigen decomposition of `CovarianceFactor`, recomputed from the window at each step.
+
+    :param window: number of observations in the baseline, more than the number of features
+    :param alpha: significance level - used to calculate control lines at α/2 and 1-α/2
+    :param refresh: optional, recompute the statistics from the window every `refresh` steps, bounding rounding drift
+    """
+
+    def __init__(self, window, alpha=0.001, refresh=None):
+        """Initialize an empty window."""
+        if window < 2:
+            raise ValueError(f"Error: the window must have at least 2 observations, not {window}.")
+        self.window = window
+        self.alpha = alpha
+        self.refresh = refresh
+        self.buffer = deque()
+        self.mean = None
+        self.comoment = None
+        self.factor = None
+        self.limits = None
+        self._steps = 0
+
+    def _statistics(self, values):
+        """Mean, co-moment matrix and its factorization of the observations of a window."""
+        values = np.asarray(values)
+        p = values.shape[1]
+        if self.window <= p:
+            raise ValueError(f"Error: the window ({self.window}) must have more observations than features ({p}).")
+        mean = values.mean(0)
+        centered = values - mean
+        comoment = centered.T @ centered
+        return mean, comoment, CovarianceFactor(comoment)
+
+    def _factorize(self):
+        """Compute the mean and factorization of the co-moment matrix from the window."""
+        self.mean, self.comoment, self.factor = self._statistics(self.buffer)
+        self.limits = control_interval(self.window, self.window, self.mean.shape[0], phase=2, alpha=self.alpha)
+
+    def _push(self, x):
+        """Add x to the window, then remove the oldest observation. The state is unchanged if this fails."""
+        n = self.window
+        oldest = self.buffer[0]
+        deviation = x - self.mean
+        mean = self.mean + deviation / (n + 1)
+        leaving = oldest - mean
+        comoment = (
+            self.comoment + (n / (n + 1)) * np.outer(deviation, deviation) - ((n + 1) / n) * np.outer(leaving, leaving)
+        )
+        mean = mean - leaving / n
+        lower, info = dpotrf(comoment, lower=1, clean=1)
+        if info == 0:
+            factor = CovarianceFactor.from_cholesky(lower)
+        else:
+            # singular window, or rounding left the downdated matrix indefinite, recompute from the observations
+            mean, comoment, factor = self._statistics(list(self.buffer)[1:] + [x])
+        self.buffer.popleft()
+        self.buffer.append(x)
+        self.mean, self.comoment, self.factor = mean, comoment, factor
+
+    def score(self, x):
+        """score.
+
+        :param x: 1d array-like (p), one observation
+        :return: T2 of x against the current window
+        """
+        return (self.window - 1) * self.factor.mahalanobis(np.asarray(x, dtype=float) - self.mean)
+
+    def update(self, batch):
+        """update.
+
+        Score each observation of the batch against the window, in order, then roll it into the window. Until the
+        window is full, observations only fill it and their T2 is NaN.
+
+        :param batch: one observation (p) or a batch of observations (k, p), array-like
+        :return: T2 values (k), out of control flags (k)
+        """
+        batch = np.asarray(batch, dtype=float)
+        if batch.ndim == 1:
+            batch = batch.reshape(1, -1)
+        t2 = np.full(batch.shape[0], np.nan)
+        for i, x in enumerate(batch):
+            if self.factor is None:
+                self.buffer.append(x)
+                if len(self.buffer) == self.window:
+                    self._factorize()
+                continue
+            t2[i] = self.score(x)
+            self._push(x)
+            self._steps += 1
+            if self.refresh and self._steps % self.refresh == 0:
+                self._factorize()
+        if self.limits is None:
+            return t2, np.zeros(t2.shape, dtype=bool)
+        lcl, _, ucl = self.limits
+        return t2, (t2 > ucl) | (t2 < lcl)
+
+
+def _limit_for_arl(statistics, arl0):
+    """_limit_for_arl.
+
+    Control limit h giving an average run length of arl0, for simulated in-control chains of a chart statistic.
+
+    :param statistics: 2d array (chains, steps) of simulated in-control statistics
+    :param arl0: in-control average run length
+    :return: h
+    """
+    running_max = np.maximum.accumulate(statistics, axis=1)
+
+    def arl(h):
+        # run length is the first step exceeding h, (censored at the simulated horizon)
+        return 1 + np.count_nonzero(running_max <= h, axis=1).mean()
+
+    low, high = 0.0, float(running_max[:, -1].max())
+    for _ in range(60):
+        mid = (low + high) / 2
+        if arl(mid) < arl0:
+            low = mid
+        else:
+            high = mid
+    return high
+
+
+def _simulate_limit(chart, p, arl0, n_chains, random_state):
+    """_simulate_limit.
+
+    Simulate n_chains in-control streams of standard normal (whitened) observations in parallel over 10 arl0 steps,
+    through chart(noise (chains, steps, p), state) -> (statistics (chains, steps), state), and calibrate the limit.
+    """
+    rng = np.random.default_rng(random_state)
+    horizon = int(10 * arl0)
+    step = max(1, SIMULATION_CELLS // (n_chains * p))
+    statistics = np.empty((n_chains, horizon))
+    state = None
+    for start in range(0, horizon, step):
+        size = min(step, horizon - start)
+        statistics[:, start:start + size], state = chart(rng.standard_normal((n_chains, size, p)), state)
+    return _limit_for_arl(statistics, arl0)
+
+
+def _mewma_filter(lam, whitened, state):
+    """Run the MEWMA recursion z_t = λ x_t + (1 - λ) z_t-1 along axis -2, as one vectorized linear filter."""
+    zi = (1 - lam) * state[..., np.newaxis, :]
+    z, _ = lfilter([lam], [1, lam - 1], whitened, axis=-2, zi=zi)
+    statistics = (2 - lam) / lam * np.einsum("...i,...i->...", z, z)
+    return statistics, z[..., -1, :]
+
+
+@lru_cache(maxsize=128)
+def mewma_limit(p, lam=0.1, arl0=200, n_chains=1000, random_state=0):
+    """mewma_limit.
+
+    Upper control limit of the MEWMA chart for a given in-control average run length, calibrated by a (cached)
+    simulation of n_chains in-control streams.
+
+    :param p: number of features
+    :param lam: smoothing constant λ, between 0 and 1
+    :param arl0: in-control average run length
+    :param n_chains: number of simulated streams
+    :param random_state: seed of the simulation
+    :return: upper control limit
+    """
+
+    def chart(noise, state):
+        return _mewma_filter(lam, noise, np.zeros((noise.shape[0], p)) if state is None else state)
+
+    return _simulate_limit(chart, p, arl0, n_chains, random_state)
+
+
+class _SequentialChart:
+    """_SequentialChart.
+
+    Streaming and batch interface shared by the MEWMA and MCUSUM charts. The baseline covariance is factorized once,
+    observations are whitened in blocks with one triangular solve, and the chart recursion runs on the whitened
+    block with its state carried from one call of `update` to the next, so streaming and batch (`run`) agree. When
+    S is singular, the observations are whitened to the rank of S, which is then the dimension of the state and of
+    the simulated limit.
+    """
+
+    def __init__(self, x_bar, s, ucl=None, arl0=200):
+        """Initialize from the baseline statistics."""
+        self.x_bar = np.asarray(x_bar, dtype=float).ravel()
+        self.p = self.x_bar.shape[0]
+        self.factor = factorize(s)
+        self.rank = self.factor.rank
+        self.ucl = self._limit(arl0) if ucl is None else ucl
+        self.reset()
+
+    @classmethod
+    def from_baseline(cls, x, **kwargs):
+        """from_baseline.
+
+        :param x: pandas or dask dataframe, phase 1 observations
+        :param kwargs: chart parameters
+        :return: chart
+        """
+        x_bar, s = control_stats(x)
+        return cls(x_bar, s, **kwargs)
+
+    def reset(self):
+        """Restart the chart from a zero state."""
+        self.state = np.zeros(self.rank)
+
+    def update(self, batch):
+        """update.
+
+        :param batch: one observation (p) or a batch of consecutive observations (k, p), array-like
+        :return: chart statistics (k), out of control flags (k)
+        """
+        batch = np.asarray(batch, dtype=float)
+        if batch.ndim == 1:
+            batch = batch.reshape(1, -1)
+        statistics, self.state = self._filter(self.factor.whiten(batch - self.x_bar), self.state)
+        return statistics, statistics > self.ucl
+
+    def run(self, x, chunksize=CHUNKSIZE):
+        """run.
+
+        Batch mode, continue the chart over all the rows of x, in blocks of chunksize rows.
+
+        :param x: array-like, numpy array, pandas or dask dataframe (n, p)
+        :param chunksize: max number of rows per block
+        :return: chart statistics (n), out of control flags (n)
+        """
+        statistics = np.concatenate([self.update(chunk)[0] for chunk in _iter_chunks(x, chunksize)] or [np.empty(0)])
+        return statistics, statistics > self.ucl
+
+
+class MEWMA(_SequentialChart):
+    r"""MEWMA.
+
+    Multivariate exponentially weighted moving average chart (Lowry et al. 1992), for small sustained shifts of the
+    mean. With x_t the observations, the chart statistic is
+
+    .. math::
+        z_t = \\lambda (x_t - \\bar{x}) + (1 - \\lambda) z_{t-1}, \\quad T^2_t = z_t^{T} \\Sigma_z^{-1} z_t
+
+    using the steady state covariance Σz = λ / (2 - λ) S. The recursion runs as a vectorized linear filter.
+
+    :param x_bar: baseline sample mean (p)
+    :param s: baseline sample covariance (p, p), or CovarianceFactor
+    :param lam: smoothing constant λ, between 0 and 1
+    :param ucl: upper control limit (optional), defaults to `mewma_limit` for arl0
+    :param arl0: in-control average run length used to compute the limit
+    """
+
+    def __init__(self, x_bar, s, lam=0.1, ucl=None, arl0=200):
+        """Initialize from the baseline statistics."""
+        self.lam = lam
+        super().__init__(x_bar, s, ucl=ucl, arl0=arl0)
+
+    def _limit(self, arl0):
+        return mewma_limit(self.rank, self.lam, arl0)
+
+    def _filter(self, whitened, state):
+        return _mewma_filter(self.lam, whitened, state)
+
+
+def _mcusum_filter(k, whitened, state):
+    """_mcusum_filter.
+
+    Crosier's MCUSUM recursion along axis -2 of the whitened observations, vectorized over any leading axes
+    (parallel chains): s_t = (s_t-1 + x_t)(1 - k / C_t) if C_t = ||s_t-1 + x_t|| > k, else 0, and Y_t = ||s_t||.
+
+    The recursion is not linear, each step depends on the norm of the previous state, so it runs as a Python loop
+    over the rows: a single stream costs a few microseconds per observation (vs well under one for the MEWMA
+    filter), the simulated chains of `mcusum_limit` are vectorized over the chains at each step.
+    """
+    statistics = np.empty(whitened.shape[:-1])
+    s = np.array(state, dtype=float)
+    if whitened.ndim == 2:
+        # single stream, scalar operations on the norm, einsum and clip overheads dominate at one row per step
+        for t, row in enumerate(whitened):
+            s += row
+            c = math.sqrt(s.dot(s))
+            if c > k:
+                s *= 1 - k / c
+                statistics[t] = c - k
+            else:
+                s[:] = 0
+                statistics[t] = 0.0
+        return statistics, s
+    for t in range(whitened.shape[-2]):
+        s += whitened[..., t, :]
+        c = np.sqrt(np.einsum("...i,...i->...", s, s))
+        shrink = np.clip(1 - k / np.maximum(c, k), 0, None)
+        s *= shrink[..., np.newaxis]
+        statistics[..., t] = c * shrink
+    return statistics, s
+
+
+@lru_cache(maxsize=128)
+def mcusum_limit(p, k=0.5, arl0=200, n_chains=1000, random_state=0):
+    """mcusum_limit.
+
+    Upper control limit of the MCUSUM chart for a given in-control average run length, calibrated by a (cached)
+    simulation of n_chains in-control streams.
+
+    :param p: number of features
+    :param k: reference value (allowance) k > 0
+    :param arl0: in-control average run length
+    :param n_chains: number of simulated streams
+    :param random_state: seed of the simulation
+    :return: upper control limit
+    """
+
+    def chart(noise, state):
+        return _mcusum_filter(k, noise, np.zeros((noise.shape[0], p)) if state is None else state)
+
+    return _simulate_limit(chart, p, arl0, n_chains, random_state)
+
+
+class MCUSUM(_SequentialChart):
+    r"""MCUSUM.
+
+    Crosier's multivariate cumulative sum chart, for small sustained shifts of the mean. With x_t the observations:
+
+    .. math::
+        C_t = \\sqrt{(s_{t-1} + x_t - \\bar{x})^{T} S^{-1} (s_{t-1} + x_t - \\bar{x})}
+
+        s_t = 0 \\text{ if } C_t \\le k, \\text{ else } (s_{t-1} + x_t - \\bar{x})(1 - k / C_t)
+
+        Y_t = \\sqrt{s_t^{T} S^{-1} s_t}
+
+    The recursion is sequential, it runs on whitened blocks with a few small vector operations per step, on numpy
+    arrays rather than dataframe rows, at a few microseconds per observation, see `_mcusum_filter`.
+
+    See:
+        - Crosier, R.B. (1988). Multivariate Generalizations of Cumulative Sum Quality-Control Schemes.
+          Technometrics, 30:3, 291-303, DOI:10.1080/00401706.1988.10488402
+
+    :param x_bar: baseline sample mean (p)
+    :param s: baseline sample covariance (p, p), or CovarianceFactor
+    :param k: reference value (allowance) k > 0, typically half the shift to detect, in standard deviations
+    :param ucl: upper control limit (optional), defaults to `mcusum_limit` for arl0
+    :param arl0: in-control average run length used to compute the limit
+    """
+
+    def __init__(self, x_bar, s, k=0.5, ucl=None, arl0=200):
+        """Initialize from the baseline statistics."""
+        self.k = k
+        super().__init__(x_bar, s, ucl=ucl, arl0=arl0)
+
+    def _limit(self, arl0):
+        return mcusum_limit(self.rank, self.k, arl0)
+
+    def _filter(self, whitened, state):
+        return _mcusum_filter(self.k, whitened, state)
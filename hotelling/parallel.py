@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""parallel.py.
+
+Multi-process computations on a single machine, for when dask is not available. The rows are placed once in shared
+memory, each worker process attaches to it and reduces its own range of rows to partial statistics, which are then
+merged. Only the small partial results are pickled between processes, never the rows themselves.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+import os
+
+import numpy as np
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:  # python < 3.8
+    shared_memory = None
+
+from hotelling.stats import CHUNKSIZE, SufficientStats
+
+
+def cpu_count():
+    """cpu_count.
+
+    :return: number of cpus available to this process
+    """
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+@contextmanager
+def shared_array(x, dtype=float):
+    """shared_array.
+
+    Copy x once into a shared memory block, released on exit. Numpy arrays are cast straight into the block, pandas
+    dataframes are converted CHUNKSIZE rows at a time, so there is no intermediate copy of the whole data.
+
+    :param x: array-like, numpy array or pandas dataframe
+    :param dtype: dtype of the shared array
+    :return: (name, shape, dtype) of the shared block, to pass to `attach` in a worker
+    """
+    if not hasattr(x, "shape"):
+        x = np.asarray(x, dtype=dtype)
+    shape, dtype = tuple(x.shape), np.dtype(dtype)
+    shm = shared_memory.SharedMemory(create=True, size=max(int(np.prod(shape)) * dtype.itemsize, 1))
+    try:
+        shared = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        if isinstance(x, np.ndarray):
+            shared[...] = x
+        else:
+            for start in range(0, shape[0], CHUNKSIZE):
+                shared[start:start + CHUNKSIZE] = x.iloc[start:start + CHUNKSIZE].to_numpy(dtype=dtype)
+        del shared
+        yield shm.name, shape, dtype.str
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+@contextmanager
+def attach(name, shape, dtype):
+    """attach.
+
+    Worker side of `shared_array`, view the shared block as a numpy array, without copying it.
+
+    :param name: shared memory block name
+    :param shape: shape of the array
+    :param dtype: dtype of the array
+    :return: numpy array
+    """
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        yield np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+    finally:
+        shm.close()
+
+
+def _partial_stats(block, start, stop, chunksize):
+    """Reduce rows [start, stop) of the shared block to SufficientStats (runs in a worker process)."""
+    with attach(*block) as values:
+        acc = SufficientStats.from_data(values[start:stop], chunksize)
+        del values
+    return acc
+
+
+def row_ranges(n, parts):
+    """row_ranges.
+
+    :param n: number of rows
+    :param parts: number of contiguous ranges
+    :return: list of (start, stop), covering all n rows
+    """
+    bounds = np.linspace(0, n, min(max(parts, 1), max(n, 1)) + 1).astype(int)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def parallel_stats(x, workers=None, chunksize=CHUNKSIZE, dtype=float):
+    """parallel_stats.
+
+    Same result as `SufficientStats.from_data`, computed by a pool of worker processes, each reducing a range of
+    rows of x placed in shared memory. Falls back to a single process if shared memory is not available.
+
+    :param x: array-like, numpy array or pandas dataframe
+    :param workers: number of processes, defaults to the number of cpus
+    :param chunksize: max number of rows per block, within each worker
+    :param dtype: dtype of the rows in shared memory, float64 (default) or float32 for half the memory, the statistics
+        are accumulated in float64 either way
+    :return: SufficientStats
+    """
+    workers = workers or cpu_count()
+    columns = getattr(x, "columns", None)
+    if workers < 2 or shared_memory is None:
+        return SufficientStats.from_data(x, chunksize)
+    acc = SufficientStats(columns)
+    with shared_array(x, dtype) as block, ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(_partial_stats, block, start, stop, chunksize)
+            for start, stop in row_ranges(block[1][0], workers)
+        ]
+        for future in futures:
+            acc.merge(future.result())
+    return acc
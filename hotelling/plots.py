@@ -13,25 +13,49 @@ See:
     with Multiresponse Data. Biometrics 28, 81-124
 
 """
+from functools import lru_cache
 from warnings import warn
 
-import matplotlib.pyplot as plt
+import numpy as np
 import pandas as pd
+from scipy import stats
 
-try:
-    from plotly.offline import iplot
-    from plotly.subplots import make_subplots
-    import plotly.tools as tls
+from hotelling.display import DisplayLevels
+from hotelling.profiling import profiled, stage
+from hotelling.stats import SufficientStats, hotelling_t2_scores, use_chi2
+
+# matplotlib and plotly are slow to import, they are only imported when a chart is drawn
+plt = None
+plotly_module = None
+
+
+def _pyplot():
+    """Import matplotlib.pyplot on first use, as the module global `plt`."""
+    global plt
+    if plt is None:
+        import matplotlib.pyplot
+
+        plt = matplotlib.pyplot
+    return plt
 
-    plotly_module = True
-except ModuleNotFoundError:
-    plotly_module = False
-from scipy import stats
 
-from hotelling.stats import hotelling_t2
+def _plotly():
+    """Probe for plotly on first use, importing iplot, make_subplots and tls as module globals if available."""
+    global plotly_module, iplot, make_subplots, tls
+    if plotly_module is None:
+        try:
+            from plotly.offline import iplot
+            from plotly.subplots import make_subplots
+            import plotly.tools as tls
+
+            plotly_module = True
+        except ModuleNotFoundError:
+            plotly_module = False
+    return plotly_module
 
 
-def control_interval(m, n, f, phase=1, alpha=0.001):
+@lru_cache(maxsize=1024)
+def control_interval(m, n, f, phase=1, alpha=0.001, approximation="f"):
     """control_interval.
 
     For Hotelling control charts, phase 1 is using Qi. This follows a beta distribution, not an F distribution. For
@@ -39,6 +63,12 @@ def control_interval(m, n, f, phase=1, alpha=0.001):
     The lower and upper lines are based on the quantiles of the distribution (aka `percent point function`)
     for α and 1 - α, while the center line is the median (50%).
 
+    For large baselines, both converge to a chi square distribution with f degrees of freedom, which can be used
+    instead with `approximation`, avoiding beta / F quantiles with extreme parameters.
+
+    Results are kept in a least recently used cache, as charts are typically refreshed with the same parameters.
+    See `control_intervals` to compute many limits at once.
+
     See:
         - Seber, G (1984). Multivariate Observations. John Wiley & Sons.
         - Nola D. Tracy, John C. Young & Robert L. Mason (1992) Multivariate Control Charts for individual Observations,
@@ -49,47 +79,113 @@ def control_interval(m, n, f, phase=1, alpha=0.001):
     :param f: number of features in the multivariate samples
     :param phase: 1 or 2 - phase 1 is within initial sample, phase 2 is measuring implemented control
     :param alpha: significance level - used to calculate control lines at α/2 and 1-α/2
-    :return:
+    :param approximation: "f" (default, beta or F), "chi2", or "auto" for chi2 when m / f > CHI2_RATIO
+    :return: lcl, cl, ucl
     """
-    if phase == 1:
-        lcl = float(
-            ((m - 1) * (n - 1) / m)
-            * (stats.beta(f / 2, ((m - f - 1) / 2)).ppf(alpha / 2)),
-        )
-        cl = float(
-            ((m - 1) * (n - 1) / m) * (stats.beta(f / 2, ((m - f - 1) / 2)).ppf(0.5)),
-        )
-        ucl = float(
-            ((m - 1) * (n - 1) / m)
-            * (stats.beta(f / 2, ((m - f - 1) / 2)).ppf(1 - alpha / 2)),
-        )
-    else:
-        lcl = float(
-            (f * (m - 1) * (m + 1)) / (m * (m - f)) * stats.f(f, m - f).ppf(alpha / 2)
-        )
-        cl = float((f * (m - 1) * (m + 1)) / (m * (m - f)) * stats.f(f, m - f).ppf(0.5))
-        ucl = float(
-            (f * (m - 1) * (m + 1))
-            / (m * (m - f))
-            * stats.f(f, m - f).ppf(1 - alpha / 2)
-        )
-    return lcl, cl, ucl
+    return tuple(float(limit) for limit in control_intervals(m, n, f, phase, alpha, approximation))
+
+
+def control_intervals(m, n, f, phase=1, alpha=0.001, approximation="f"):
+    """control_intervals.
 
+    Vectorized `control_interval`: all parameters can be arrays (broadcast together), and the quantiles of each
+    distribution are computed in a single scipy call.
 
-def control_stats(x):
+    :param m: sample groups (between 1 and n), array-like
+    :param n: number of samples, array-like
+    :param f: number of features in the multivariate samples, array-like
+    :param phase: 1 or 2 - phase 1 is within initial sample, phase 2 is measuring implemented control, array-like
+    :param alpha: significance level - used to calculate control lines at α/2 and 1-α/2, array-like
+    :param approximation: "f" (default, beta or F), "chi2", or "auto" for chi2 when m / f > CHI2_RATIO
+    :return: lcl, cl, ucl arrays
+    """
+    m, n, f, phase, alpha = np.broadcast_arrays(*(np.asarray(v, dtype=float) for v in (m, n, f, phase, alpha)))
+    q = np.stack([alpha / 2, np.full(alpha.shape, 0.5), 1 - alpha / 2])
+    limits = np.empty(q.shape)
+    chi2_mask = use_chi2(m, f, approximation)
+    beta_mask = (phase == 1) & ~chi2_mask
+    f_mask = ~beta_mask & ~chi2_mask
+    if chi2_mask.any():
+        limits[:, chi2_mask] = stats.chi2.ppf(q[:, chi2_mask], f[chi2_mask])
+    if beta_mask.any():
+        mb, nb, fb = m[beta_mask], n[beta_mask], f[beta_mask]
+        limits[:, beta_mask] = ((mb - 1) * (nb - 1) / mb) * stats.beta.ppf(q[:, beta_mask], fb / 2, (mb - fb - 1) / 2)
+    if f_mask.any():
+        mf, ff = m[f_mask], f[f_mask]
+        limits[:, f_mask] = (ff * (mf - 1) * (mf + 1)) / (mf * (mf - ff)) * stats.f.ppf(q[:, f_mask], ff, mf - ff)
+    return limits[0], limits[1], limits[2]
+
+
+def control_stats(x, robust=False, covariance="sample", dtype=None, **kwargs):
     """control_stats.
 
-    Compute the sample mean vector and the covariance matrix
+    Compute the sample mean vector and the covariance matrix, or with robust=True, the FAST-MCD estimates (see
+    `hotelling.robust.fast_mcd`), which are not pulled by outliers in the baseline.
 
     :param x: pandas dataframe, uni or multivariate
+    :param robust: bool, use the robust FAST-MCD estimates
+    :param covariance: "sample" (default), or "ledoit_wolf" / "oas" for a shrinkage estimate of the covariance, for
+        many features and few baseline observations, see `hotelling.stats.shrinkage_intensity`
+    :param dtype: storage dtype of x (optional), for example np.float32, the statistics are accumulated in float64
+        one block at a time, see `hotelling.stats.hotelling_t2`
+    :param kwargs: passed to `fast_mcd` (random_state, workers...) when robust
     :return: sample mean, sample covariance
     """
+    if robust:
+        if covariance != "sample":
+            raise ValueError("Error: robust estimates can't be combined with a shrinkage covariance.")
+        from hotelling.robust import fast_mcd
+
+        return fast_mcd(x, **kwargs)
+    if covariance != "sample" or dtype is not None:
+        acc = SufficientStats.from_data(x if dtype is None else x.astype(dtype))
+        cov = acc.cov(covariance=covariance)
+        if acc.columns is None:
+            return acc.mean, cov
+        return pd.Series(acc.mean, index=acc.columns), pd.DataFrame(cov, index=acc.columns, columns=acc.columns)
     try:
         return x.mean(0).compute(), x.cov().compute()
     except AttributeError:
         return x.mean(0), x.cov()
 
 
+def display_levels(
+    x, phase=1, alpha=0.001, x_bar=None, s=None, approximation="f", robust=False, covariance="sample", dtype=None
+):
+    """display_levels.
+
+    T2 values of all the rows of x, scored in chunks against the baseline, with the control limits and the min / max
+    decimation levels to display them, see `hotelling.display.DisplayLevels`. Compute them once, and pass them to
+    `control_chart` in place of x to redraw any range of rows (xlim) without scoring the rows again.
+
+    :param x: pandas or dask dataframe, uni or multivariate
+    :param phase: 1 or 2, see `control_chart`
+    :param alpha: significance level, see `control_chart`
+    :param x_bar: sample mean (optional, required with s)
+    :param s: sample covariance or CovarianceFactor (optional, required with x_bar)
+    :param approximation: distribution for the control limits, "f", "chi2" or "auto", see `control_interval`
+    :param robust: bool, when x_bar and s are not given, use the robust FAST-MCD baseline, see `control_stats`
+    :param covariance: when x_bar and s are not given, "sample" (default), "ledoit_wolf" or "oas", see `control_stats`
+    :param dtype: storage dtype of x (optional), see `control_stats`
+    :return: DisplayLevels
+    """
+    # computing each individual values to the mean and covariance of the whole dataset
+    if x_bar is None and s is None:
+        with stage("control_stats", x):
+            x_bar, s = control_stats(x, robust=robust, covariance=covariance, dtype=dtype)
+    elif x_bar is None or s is None:
+        raise ValueError("Error: must specify both x_bar and s, or none at all.")
+
+    _, f = x.shape
+    with stage("t2_scores", x):
+        qi = hotelling_t2_scores(x, x_bar, s)
+    n = qi.shape[0]
+    with stage("control_interval"):
+        lcl, cl, ucl = control_interval(n, n, f, phase=phase, alpha=alpha, approximation=approximation)
+    return DisplayLevels(qi, lcl, cl, ucl, f)
+
+
+@profiled("control_chart")
 def control_chart(
     x,
     phase=1,
@@ -106,6 +202,12 @@ def control_chart(
     random_state=42,
     limit=1000,
     no_display=False,
+    approximation="f",
+    robust=False,
+    covariance="sample",
+    dtype=None,
+    display="minmax",
+    xlim=None,
 ):
     """control_chart.
 
@@ -113,11 +215,15 @@ def control_chart(
 
     See also `control_interval` for more detail
 
-    :param x: pandas dataframe, uni or multivariate
+    The T2 values of all the observations are computed, in chunks, then reduced to about `limit` points for display,
+    keeping every out of control point, see `hotelling.display`.
+
+    :param x: pandas or dask dataframe, uni or multivariate, or DisplayLevels computed by `display_levels` (the
+        baseline and limit parameters are then ignored)
     :param phase: 1 or 2 - phase 1 is within initial sample, phase 2 is measuring implemented control
     :param alpha: significance level - used to calculate control lines at α/2 and 1-α/2
     :param x_bar: sample mean (optional, required with s)
-    :param s: sample covariance (optional, required with x_bar)
+    :param s: sample covariance or CovarianceFactor (optional, required with x_bar)
     :param legend_right: default to 'left', can specify 'right'
     :param interactive: if  True and plotly is available, renders as interactive plot in notebook. False, render image.
     :param width: how many units wide. defaults to 10, good for notebooks
@@ -125,30 +231,35 @@ def control_chart(
     :param template: plotly template, defaults to 'none', matching default matplotlib
     :param marker: default marker symbol - one valid for matplotlib
     :param ooc_marker: out of control marker symbol (x) - one valid for matplotlib
-    :param random_state: seed for sample (n > limit)
-    :param limit: max number of points to plot, defaults to 1000
+    :param random_state: seed for display="random"
+    :param limit: max number of points to plot, besides the out of control points, defaults to 1000
+    :param approximation: distribution for the control limits, "f", "chi2" or "auto", see `control_interval`
+    :param robust: bool, when x_bar and s are not given, use the robust FAST-MCD baseline, see `control_stats`
+    :param covariance: when x_bar and s are not given, "sample" (default), "ledoit_wolf" or "oas", see `control_stats`
+    :param dtype: storage dtype of x (optional), see `control_stats`
+    :param display: reduction of the observations to display, "minmax" (default) for the lowest and highest T2 of
+        buckets of rows, "lttb" (largest triangle three buckets), or "random" for a random sample of rows
+    :param xlim: (start, stop) range of rows to display (optional), to zoom in
     :return: matplotlib ax / plotly fig
     """
-    n, subset = limit_display(x, limit, random_state)
-    m = n
-
-    # computing each individual values to the mean and covariance of the whole dataset
-    if x_bar is None and s is None:
-        x_bar, s = control_stats(x)
-    elif x_bar is None or s is None:
-        raise ValueError("Error: must specify both x_bar and s, or none at all.")
-
-    # data might be a subset (sample), but control stats above are calculated on the whole dataset
-    points, f = subset.shape
-    qi = [hotelling_t2(subset[i:i + 1], x_bar, S=s) for i in range(points)]
-
-    df = pd.DataFrame({"qi": qi})
+    _pyplot()
+    if interactive:
+        _plotly()
+    if isinstance(x, DisplayLevels):
+        levels = x
+    else:
+        levels = display_levels(x, phase, alpha, x_bar, s, approximation, robust, covariance, dtype)
+    lcl, cl, ucl = levels.lcl, levels.cl, levels.ucl
+    start, stop, _ = slice(*(xlim or (None, None))).indices(len(levels))
 
-    lcl, cl, ucl = control_interval(m, n, f, phase=phase, alpha=alpha)
+    # T2 of all the rows, only some are displayed
+    with stage("display", levels.scores):
+        index = levels.view(start, stop, limit=limit, method=display, random_state=random_state)
+    df = pd.DataFrame({"qi": levels.scores[index]}, index=index)
 
     cusum_text = ""
     if cusum:
-        df["deviation"] = (df["qi"] - cl).cumsum() + cl
+        df["deviation"] = np.cumsum(levels.scores[:stop] - cl)[index] + cl
         cusum_text = f" w/deviation (ref={cl:.3f})"
     ax = df.plot(
         title=f"Hotelling Control Chart (α={alpha}, phase={phase}{cusum_text})",
@@ -164,17 +275,17 @@ def control_chart(
     except TypeError:
         # nothing to plot
         pass
-    x_pos = 0
+    x_pos = start
     align = "left"
     if legend_right:
-        x_pos = len(qi)
+        x_pos = stop
         align = "right"
     font_dict = {"family": "serif", "color": "red", "size": 10}
     if not interactive:
         ax.hlines(
             ucl,
-            xmin=0,
-            xmax=len(qi),
+            xmin=start,
+            xmax=stop,
             linestyles="dashed",
             color="r",
             label=f"UCL={ucl}",
@@ -188,7 +299,7 @@ def control_chart(
     )
     if not interactive:
         ax.hlines(
-            cl, xmin=0, xmax=len(qi), linestyles="dashed", color="k", label=f"CL={cl}"
+            cl, xmin=start, xmax=stop, linestyles="dashed", color="k", label=f"CL={cl}"
         )
     font_dict = {"family": "serif", "color": "black", "size": 10}
     plt.text(
@@ -197,8 +308,8 @@ def control_chart(
     if not interactive:
         ax.hlines(
             lcl,
-            xmin=0,
-            xmax=len(qi),
+            xmin=start,
+            xmax=stop,
             linestyles="dashed",
             color="r",
             label=f"LCL={lcl}",
@@ -216,9 +327,9 @@ def control_chart(
         for var, col in [(ucl, "Red"), (lcl, "Red"), (cl, "Black")]:
             fig.add_shape(
                 type="line",
-                x0=0,
+                x0=start,
                 y0=var,
-                x1=len(qi),
+                x1=stop,
                 y1=var,
                 line=dict(color=col, width=4, dash="dashdot",),
             )
@@ -230,6 +341,7 @@ def control_chart(
         return ax
 
 
+@profiled("limit_display")
 def limit_display(x, limit, random_state):
     """limit_displau.
 
@@ -299,6 +411,9 @@ def univariate_control_chart(
     :param limit: max number of points to plot, defaults to 1000
     :return: returns matplotlib figure or array of plotly figures
     """
+    _pyplot()
+    if interactive:
+        _plotly()
     n, *f, df = limit_display(x, limit, random_state)
     num_plots = len(df.columns)
     k = sigma  # 3 sigma default
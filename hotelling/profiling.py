@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+"""profiling.py.
+
+Opt-in timing of the stages of the tests and charts (loading, means, covariance, solve, p value, plotting...).
+
+Instrumented functions open a `stage` for each step. When no callback is registered, which is the default, `stage`
+returns a shared do-nothing context manager: the overhead is a single check per stage, not per row. When enabled,
+each stage reports a `StageRecord` with its wall time, rows and bytes of the data it processed, to every callback.
+
+Example::
+
+    from hotelling.profiling import profile
+
+    with profile() as prof:
+        hotelling_t2(x, y)
+    print(prof.report())
+"""
+from collections import namedtuple
+from contextlib import contextmanager
+from functools import wraps
+import os
+import threading
+from time import perf_counter
+
+StageRecord = namedtuple("StageRecord", ["name", "path", "start", "seconds", "rows", "nbytes"])
+StageRecord.__doc__ = """Stage timing: name, path (enclosing stages / name), start (perf_counter), seconds, rows and
+bytes (None if unknown)."""
+
+_callbacks = []
+_local = threading.local()
+
+
+def add_callback(callback):
+    """add_callback.
+
+    :param callback: function called with a `StageRecord` at the end of each stage
+    :return: the callback
+    """
+    _callbacks.append(callback)
+    return callback
+
+
+def remove_callback(callback):
+    """remove_callback.
+
+    :param callback: function registered with `add_callback`
+    """
+    _callbacks.remove(callback)
+
+
+def data_size(data):
+    """data_size.
+
+    Rows and bytes of data, without computing anything: dask collections are reported as unknown.
+
+    :param data: numpy array, pandas object, SufficientStats, or filename (bytes of the file)
+    :return: rows, bytes (None when unknown)
+    """
+    if data is None or hasattr(data, "dask"):
+        return None, None
+    if isinstance(data, (str, os.PathLike)):
+        try:
+            return None, os.path.getsize(data)
+        except OSError:
+            return None, None
+    if hasattr(data, "comoment"):  # SufficientStats
+        return data.n, None
+    if hasattr(data, "memory_usage"):
+        usage = data.memory_usage(index=False)
+        return len(data), int(getattr(usage, "sum", lambda: usage)())
+    if hasattr(data, "nbytes") and hasattr(data, "shape"):
+        return (data.shape[0] if data.shape else 1), int(data.nbytes)
+    return None, None
+
+
+class _NoStage:
+    """Shared context manager of the stages when profiling is disabled."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def data(self, *data):
+        """Ignore the data."""
+
+
+_NO_STAGE = _NoStage()
+
+
+class _Stage:
+    """Context manager timing a stage, reported to the callbacks on exit."""
+
+    def __init__(self, name, data):
+        self.name = name
+        self.rows = None
+        self.nbytes = None
+        self.data(*data)
+
+    def data(self, *data):
+        """Add the rows and bytes of data processed by this stage."""
+        for item in data:
+            rows, nbytes = data_size(item)
+            if rows is not None:
+                self.rows = (self.rows or 0) + rows
+            if nbytes is not None:
+                self.nbytes = (self.nbytes or 0) + nbytes
+
+    def __enter__(self):
+        stack = getattr(_local, "stack", None)
+        if stack is None:
+            stack = _local.stack = []
+        stack.append(self.name)
+        self.path = "/".join(stack)
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        seconds = perf_counter() - self.start
+        _local.stack.pop()
+        record = StageRecord(self.name, self.path, self.start, seconds, self.rows, self.nbytes)
+        for callback in list(_callbacks):
+            callback(record)
+        return False
+
+
+def stage(name, *data):
+    """stage.
+
+    :param str name: stage name
+    :param data: data processed by the stage (optional), for the rows and bytes, see `data_size`. More can be added
+        with the `data` method of the returned context manager, for example the result of a loader.
+    :return: context manager timing the stage if profiling is enabled, or doing nothing
+    """
+    if not _callbacks:
+        return _NO_STAGE
+    return _Stage(name, data)
+
+
+def profiled(name, data_args=1):
+    """profiled.
+
+    Decorator, run the function as a stage.
+
+    :param str name: stage name
+    :param int data_args: number of leading positional arguments that are the data processed (x, y)
+    :return: decorator
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _callbacks:
+                return func(*args, **kwargs)
+            with _Stage(name, args[:data_args]):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+class Profile:
+    """Profile.
+
+    Collects the `StageRecord` of the stages run while it is registered, see `profile`.
+    """
+
+    def __init__(self):
+        """Initialize an empty profile."""
+        self.records = []
+
+    def __call__(self, record):
+        """Collect a record (callback)."""
+        self.records.append(record)
+
+    def report(self):
+        """report.
+
+        :return: pandas dataframe indexed by stage path, in order of first start, with the number of calls, the total
+            seconds, rows and bytes of each
+        """
+        import pandas as pd
+
+        columns = ["calls", "seconds", "rows", "nbytes"]
+        if not self.records:
+            return pd.DataFrame(columns=columns, index=pd.Index([], name="path"))
+        df = pd.DataFrame(self.records, columns=StageRecord._fields)
+        groups = df.groupby("path", sort=False)
+        report = groups.agg(
+            start=("start", "min"), calls=("name", "size"), seconds=("seconds", "sum"),
+            rows=("rows", lambda rows: rows.sum(min_count=1)), nbytes=("nbytes", lambda nbytes: nbytes.sum(min_count=1)),
+        )
+        return report.sort_values("start")[columns]
+
+
+@contextmanager
+def profile():
+    """profile.
+
+    Enable profiling in this block, collecting the stages in a `Profile`.
+
+    :return: Profile, with the records and a report
+    """
+    prof = add_callback(Profile())
+    try:
+        yield prof
+    finally:
+        remove_callback(prof)
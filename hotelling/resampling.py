@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+"""resampling.py.
+
+Distribution free alternatives to the F distribution for Hotelling's T-Squared two sample test, by resampling.
+
+See:
+  - Good, P. (2005). Permutation, Parametric and Bootstrap Tests of Hypotheses. Springer Series in Statistics.
+  - Efron, B. & Tibshirani, R.J. (1993). An Introduction to the Bootstrap. Chapman & Hall.
+"""
+from concurrent.futures import ProcessPoolExecutor
+
+from contextlib import ExitStack
+
+import numpy as np
+import pandas as pd
+
+from hotelling.parallel import attach, shared_array, shared_memory
+from hotelling.stats import CovarianceFactor, hotelling_t2
+
+BATCH_CELLS = 2 ** 23  # max size of the (resamples, rows) indicator / count matrix of a batch
+
+
+def _whitened_pool(x, y):
+    """_whitened_pool.
+
+    Center the pooled samples and whiten them by the total scatter matrix T, factorized once. For any split of the
+    rows in two groups of nx and ny rows, with s the sum of the whitened rows of the first group,
+    a = s sᵀ n / (nx ny) is the between groups part of T, and T2 = (n - 2) a / (1 - a).
+
+    :return: whitened rows (n, p), nx, ny
+    """
+    pooled = np.concatenate([np.asarray(x, dtype=float), np.asarray(y, dtype=float)])
+    centered = pooled - pooled.mean(0)
+    return CovarianceFactor(centered.T @ centered).whiten(centered), len(x), len(y)
+
+
+def _between(sums, nx, ny):
+    """Between groups share `a` of the total scatter, from the sums of the whitened rows of the first group."""
+    return np.einsum("ij,ij->i", sums, sums) * (nx + ny) / (nx * ny)
+
+
+def _permuted_between(whitened, nx, n_permutations, seed):
+    """Between groups share for n_permutations random splits, in batches of indicator matrix products."""
+    rng = np.random.default_rng(seed)
+    n = whitened.shape[0]
+    batch = max(1, BATCH_CELLS // n)
+    res = []
+    for start in range(0, n_permutations, batch):
+        size = min(batch, n_permutations - start)
+        # the nx rows with the smallest random keys go to x: a uniform random split, selected in O(n)
+        keys = rng.random((size, n))
+        indicator = (keys <= np.partition(keys, nx - 1, axis=1)[:, nx - 1:nx]).astype(float)
+        res.append(_between(indicator @ whitened, nx, n - nx))
+    return np.concatenate(res)
+
+
+def _shared_permuted_between(block, nx, n_permutations, seed):
+    """Run `_permuted_between` on the whitened rows in shared memory (in a worker process)."""
+    with attach(*block) as whitened:
+        res = _permuted_between(whitened, nx, n_permutations, seed)
+        del whitened
+    return res
+
+
+def permutation_test(x, y, n_permutations=9999, random_state=None, workers=None, task_size=1000):
+    """permutation_test.
+
+    Permutation p value of the two sample Hotelling T2 test (with pooled covariance and bessel correction). The pooled
+    rows are whitened once by the total scatter matrix: the T2 of any relabeling of the rows is then a function of
+    the sum of the whitened rows assigned to x, computed for a whole batch of permutations as one matrix product of
+    a (permutations, rows) indicator matrix with the whitened rows.
+
+    Permutations are generated in tasks of `task_size`, each with its own seed spawned from `random_state`, so the
+    result is reproducible and does not depend on the number of workers.
+
+    :param x: array-like, samples of observations
+    :param y: array-like, samples of observations
+    :param n_permutations: number of random permutations
+    :param random_state: seed (optional)
+    :param workers: number of processes (optional), defaults to a single process
+    :param task_size: number of permutations per task
+    :return: t2 statistic, permutation p value
+    """
+    whitened, nx, ny = _whitened_pool(x, y)
+    observed = _between(whitened[:nx].sum(0)[np.newaxis, :], nx, ny)[0]
+    sizes = [min(task_size, n_permutations - start) for start in range(0, n_permutations, task_size)]
+    seeds = np.random.SeedSequence(random_state).spawn(len(sizes))
+    if workers and workers > 1 and shared_memory is not None:
+        with shared_array(whitened) as block, ProcessPoolExecutor(max_workers=workers) as pool:
+            permuted = list(pool.map(_shared_permuted_between, [block] * len(sizes), [nx] * len(sizes), sizes, seeds))
+    else:
+        permuted = [_permuted_between(whitened, nx, size, seed) for size, seed in zip(sizes, seeds)]
+    permuted = np.concatenate(permuted) if permuted else np.empty(0)
+    # relative tolerance, so that permutations equivalent to the observed split count as at least as extreme
+    extreme = np.count_nonzero(permuted >= observed * (1 - 1e-10))
+    t2_stat = (nx + ny - 2) * observed / (1 - observed)
+    return t2_stat, (extreme + 1) / (n_permutations + 1)
+
+
+def _resample_counts(rng, size, n):
+    """Bootstrap resamples of n rows, as a (size, n) matrix of the number of times each row is drawn."""
+    draws = rng.integers(0, n, (size, n)) + (np.arange(size) * n)[:, np.newaxis]
+    return np.bincount(draws.ravel(), minlength=size * n).reshape(size, n).astype(float)
+
+
+def _weighted_moments(values, counts):
+    """_weighted_moments.
+
+    Means and covariances of resamples of values (n, p) given as count vectors (size, n), without materializing the
+    resampled rows: the sums and cross-products are matrix products of the counts with the rows (and their outer
+    products), in blocks of rows.
+    """
+    size, n = counts.shape
+    p = values.shape[1]
+    sums = np.zeros((size, p))
+    cross = np.zeros((size, p * p))
+    rows = max(1, BATCH_CELLS // (p * p))
+    for start in range(0, n, rows):
+        block = values[start:start + rows]
+        weights = counts[:, start:start + rows]
+        sums += weights @ block
+        cross += weights @ np.einsum("ij,ik->ijk", block, block).reshape(len(block), p * p)
+    means = sums / n
+    cov = (cross.reshape(size, p, p) - n * np.einsum("bi,bj->bij", means, means)) / (n - 1)
+    return means, cov
+
+
+def _bootstrap(x, y, offset, size, seed):
+    """T2 and mean differences for `size` bootstrap resamples of centered x (and y, resampled independently).
+
+    offset is the observed difference of means, added back to the differences of the centered resamples.
+    """
+    rng = np.random.default_rng(seed)
+    nx, p = x.shape
+    batch = max(1, BATCH_CELLS // max(nx, 1 if y is None else y.shape[0]))
+    t2, diffs = [], []
+    for start in range(0, size, batch):
+        count = min(batch, size - start)
+        diff, s = _weighted_moments(x, _resample_counts(rng, count, nx))
+        diff = diff + offset
+        scale = nx
+        if y is not None:
+            ny = y.shape[0]
+            y_diff, y_s = _weighted_moments(y, _resample_counts(rng, count, ny))
+            diff = diff - y_diff
+            s = ((nx - 1) * s + (ny - 1) * y_s) / (nx + ny - 2)
+            scale = nx * ny / (nx + ny)
+        t2.append(scale * np.einsum("bi,bi->b", diff, np.linalg.solve(s, diff[:, :, np.newaxis])[:, :, 0]))
+        diffs.append(diff)
+    return np.concatenate(t2), np.concatenate(diffs)
+
+
+def _shared_bootstrap(x_block, y_block, offset, size, seed):
+    """Run `_bootstrap` on samples in shared memory (in a worker process)."""
+    with ExitStack() as stack:
+        x = stack.enter_context(attach(*x_block))
+        y = None if y_block is None else stack.enter_context(attach(*y_block))
+        res = _bootstrap(x, y, offset, size, seed)
+        del x, y
+    return res
+
+
+def bootstrap_ci(x, y=None, n_resamples=1000, confidence=0.95, random_state=None, workers=None, task_size=250):
+    """bootstrap_ci.
+
+    Percentile bootstrap confidence intervals for the Hotelling T2 statistic and for each component of the difference
+    of means (x - y for the two sample test, x - y for the one sample test with y the means to test). Resamples are
+    drawn as vectors of counts (how many times each row is drawn), and the means and covariances of a batch of
+    resamples are computed as matrix products with the original rows, so resampled copies of the data are never
+    materialized. For two samples, x and y are resampled independently.
+
+    Resamples are generated in tasks of `task_size`, each with its own seed spawned from `random_state`, so the result
+    is reproducible and does not depend on the number of workers.
+
+    :param x: array-like, samples of observations for one or two sample test (required)
+    :param y: for two sample test, array-like, samples of observations (optional), for one sample, list of means to test
+    :param n_resamples: number of bootstrap resamples
+    :param confidence: confidence level of the intervals
+    :param random_state: seed (optional)
+    :param workers: number of processes (optional), defaults to a single process
+    :param task_size: number of resamples per task
+    :return: dict with t2_stat, t2_ci (low, high), mean_diff and mean_diff_ci (low and high for each feature)
+    """
+    columns = getattr(x, "columns", None)
+    x_values = np.asarray(x, dtype=float)
+    x_bar = x_values.mean(0)
+    if y is None or np.ndim(y) < 2:
+        mu = np.zeros(x_values.shape[1]) if y is None else np.asarray(y, dtype=float)
+        y_values, offset = None, x_bar - mu
+        t2_stat = hotelling_t2(x_values, mu)[0]
+    else:
+        y_values = np.asarray(y, dtype=float)
+        y_bar = y_values.mean(0)
+        y_values, offset = y_values - y_bar, x_bar - y_bar
+        t2_stat = hotelling_t2(x_values, y_values + y_bar)[0]
+    x_values = x_values - x_bar
+
+    sizes = [min(task_size, n_resamples - start) for start in range(0, n_resamples, task_size)]
+    seeds = np.random.SeedSequence(random_state).spawn(len(sizes))
+    if workers and workers > 1 and shared_memory is not None:
+        with ExitStack() as stack:
+            x_block = stack.enter_context(shared_array(x_values))
+            y_block = None if y_values is None else stack.enter_context(shared_array(y_values))
+            pool = stack.enter_context(ProcessPoolExecutor(max_workers=workers))
+            tasks = len(sizes)
+            parts = list(
+                pool.map(_shared_bootstrap, [x_block] * tasks, [y_block] * tasks, [offset] * tasks, sizes, seeds)
+            )
+    else:
+        parts = [_bootstrap(x_values, y_values, offset, size, seed) for size, seed in zip(sizes, seeds)]
+    t2 = np.concatenate([part[0] for part in parts])
+    diffs = np.concatenate([part[1] for part in parts])
+
+    quantiles = [(1 - confidence) / 2, (1 + confidence) / 2]
+    t2_ci = tuple(np.quantile(t2, quantiles))
+    mean_diff_ci = np.quantile(diffs, quantiles, axis=0).T
+    mean_diff = offset
+    if columns is not None:
+        mean_diff = pd.Series(offset, index=columns)
+        mean_diff_ci = pd.DataFrame(mean_diff_ci, index=columns, columns=["low", "high"])
+    return dict(t2_stat=t2_stat, t2_ci=t2_ci, mean_diff=mean_diff, mean_diff_ci=mean_diff_ci)
@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+"""robust.py.
+
+Robust estimates of the mean vector and covariance matrix, for phase 1 baselines contaminated by a few bad batches.
+
+See:
+  - Rousseeuw, P.J. & Van Driessen, K. (1999). A Fast Algorithm for the Minimum Covariance Determinant Estimator.
+    Technometrics, 41:3, 212-223, DOI:10.1080/00401706.1999.10485670
+"""
+from concurrent.futures import ProcessPoolExecutor
+from math import ceil
+
+import numpy as np
+import pandas as pd
+from scipy.stats import chi2
+
+from hotelling.stats import CHUNKSIZE, CovarianceFactor, SufficientStats, _iter_chunks, hotelling_t2_scores
+
+SUBSET_SIZE = 300  # rows per subset for the initial C-steps on large datasets
+MAX_SUBSETS = 5  # subsets merged in the second stage on large datasets
+N_BEST = 10  # candidates kept after each stage
+MAX_C_STEPS = 30  # C-steps to convergence on the full dataset
+
+
+def _logdet(cov):
+    """Log determinant of a covariance matrix, -inf when singular."""
+    sign, logdet = np.linalg.slogdet(cov)
+    return logdet if sign > 0 else -np.inf
+
+
+def _converge(step, mean, cov, n_steps):
+    """_converge.
+
+    Repeat a C-step until the determinant stops decreasing (or is 0, an exact fit). The first step is always taken,
+    as the starting estimate may come from fewer than h observations.
+
+    :return: log determinant, mean, covariance
+    """
+    logdet = np.inf
+    for _ in range(n_steps):
+        new_mean, new_cov = step(mean, cov)
+        new_logdet = _logdet(new_cov)
+        if new_logdet >= logdet:
+            break
+        mean, cov, logdet = new_mean, new_cov, new_logdet
+        if logdet == -np.inf:
+            break
+    return logdet, mean, cov
+
+
+def _c_steps(values, mean, cov, h, n_steps):
+    """_c_steps.
+
+    Concentration steps on an in-memory array: keep the h observations closest to the current estimate (Mahalanobis
+    distance) and re-estimate from them. Each step can only decrease the determinant of the covariance.
+
+    :return: log determinant, mean, covariance
+    """
+    def step(mean, cov):
+        closest = values[np.argpartition(CovarianceFactor(cov).mahalanobis(values - mean), h - 1)[:h]]
+        return closest.mean(0), np.cov(closest, rowvar=False)
+
+    return _converge(step, mean, cov, n_steps)
+
+
+def _subset_candidates(values, h, n_trials, n_best, seed):
+    """_subset_candidates.
+
+    Random (p + 1)-subset starts (extended until the covariance is non singular), each followed by two C-steps.
+
+    :return: the n_best (log determinant, mean, covariance) candidates
+    """
+    rng = np.random.default_rng(seed)
+    n, p = values.shape
+    candidates = []
+    for _ in range(n_trials):
+        order = rng.permutation(n)
+        size = min(p + 1, n)
+        start = values[order[:size]]
+        while size < n and _logdet(np.cov(start, rowvar=False)) == -np.inf:
+            size += 1
+            start = values[order[:size]]
+        candidates.append(_c_steps(values, start.mean(0), np.cov(start, rowvar=False), h, 2))
+    candidates.sort(key=lambda candidate: candidate[0])
+    return candidates[:n_best]
+
+
+def _full_c_step(x, mean, cov, h, chunksize):
+    """_full_c_step.
+
+    C-step over the full dataset, in chunks: the h smallest distances define a threshold, and the statistics of the
+    observations under it are accumulated block by block.
+
+    :return: mean, covariance
+    """
+    distances = hotelling_t2_scores(x, mean, CovarianceFactor(cov), chunksize)
+    threshold = np.partition(distances, h - 1)[h - 1]
+    return _accumulate_under(x, distances, threshold, chunksize)
+
+
+def _accumulate_under(x, distances, threshold, chunksize):
+    """Mean and covariance of the observations with a distance under the threshold, accumulated in chunks."""
+    acc = SufficientStats()
+    start = 0
+    for chunk in _iter_chunks(x, chunksize):
+        acc.update(chunk[distances[start:start + len(chunk)] <= threshold])
+        start += len(chunk)
+    return acc.mean, acc.cov()
+
+
+def _consistent(x, mean, cov, chunksize):
+    """Scale the covariance so that the median squared distance is the median of the chi square distribution."""
+    distances = hotelling_t2_scores(x, mean, CovarianceFactor(cov), chunksize)
+    return mean, cov * np.median(distances) / chi2.ppf(0.5, len(mean))
+
+
+def _sample_rows(x, n, size, rng):
+    """Random sample of size rows of x, without replacement."""
+    if hasattr(x, "to_delayed"):
+        return np.asarray(x.sample(frac=min(1.0, size / n), random_state=int(rng.integers(2 ** 31))).compute(), float)
+    rows = np.sort(rng.choice(n, size, replace=False))
+    # select the rows first, only the sample is converted to a float array
+    if hasattr(x, "iloc"):
+        return x.iloc[rows].to_numpy(dtype=float)
+    return np.asarray(np.asarray(x)[rows], dtype=float)
+
+
+def fast_mcd(x, support_fraction=None, n_trials=500, random_state=None, workers=None, reweight=True,
+             chunksize=CHUNKSIZE):
+    """fast_mcd.
+
+    Minimum Covariance Determinant estimate of the mean vector and covariance matrix, with the FAST-MCD algorithm:
+    the mean and covariance of the h observations whose covariance has the smallest determinant.
+
+    On large datasets, random starts run on up to 5 disjoint random subsets of 300 rows, the best candidates of each
+    are refined on the merged subsets, and only the best one goes through C-steps on the full data, done in chunks.
+    The subsets can be processed by a pool of `workers` processes, with seeds spawned from random_state.
+
+    The result is scaled for consistency at the normal distribution, then by default reweighted: the final estimate
+    is the sample mean and covariance of the observations within the 97.5% chi square quantile, scaled for the truncation.
+
+    The returned mean and covariance can be passed as `x_bar` and `s` to `control_chart`, or as `S` to
+    `hotelling_t2`. See also `control_stats(x, robust=True)`.
+
+    :param x: array-like, numpy array, pandas or dask dataframe (n, p)
+    :param support_fraction: fraction of observations h / n in the support, defaults to (n + p + 1) / 2n
+    :param n_trials: number of random starts
+    :param random_state: seed (optional)
+    :param workers: number of processes for the subsets (optional), defaults to a single process
+    :param reweight: bool, reweight the raw MCD estimate (default)
+    :param chunksize: max number of rows per block, for the passes over the full data
+    :return: mean vector, covariance matrix (pandas series and dataframe if x has columns)
+    """
+    columns = getattr(x, "columns", None)
+    n, p = x.shape
+    try:
+        n = n.compute()
+    except AttributeError:
+        pass
+    h = (n + p + 1) // 2 if support_fraction is None else int(ceil(support_fraction * n))
+    rng = np.random.default_rng(random_state)
+
+    # first stage, random starts on subsets
+    n_subsets = 1 if n <= 2 * SUBSET_SIZE else min(MAX_SUBSETS, n // SUBSET_SIZE)
+    sample = np.asarray(x, dtype=float) if n_subsets == 1 else _sample_rows(x, n, n_subsets * SUBSET_SIZE, rng)
+    subsets = np.array_split(sample, n_subsets)
+    sizes = [int(ceil(len(subset) * h / n)) for subset in subsets]
+    trials = [max(1, n_trials // n_subsets)] * n_subsets
+    seeds = np.random.SeedSequence(int(rng.integers(2 ** 31))).spawn(n_subsets)
+    if workers and workers > 1 and n_subsets > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parts = list(pool.map(_subset_candidates, subsets, sizes, trials, [N_BEST] * n_subsets, seeds))
+    else:
+        parts = [_subset_candidates(*args) for args in zip(subsets, sizes, trials, [N_BEST] * n_subsets, seeds)]
+    candidates = sorted((candidate for part in parts for candidate in part), key=lambda candidate: candidate[0])
+
+    # second stage, merged subsets
+    if n_subsets > 1:
+        h_merged = int(ceil(len(sample) * h / n))
+        candidates = sorted(
+            (_c_steps(sample, mean, cov, h_merged, 2) for _, mean, cov in candidates), key=lambda candidate: candidate[0]
+        )
+
+    # last stage, C-steps to convergence on the full data
+    best = None
+    for _, mean, cov in candidates[:N_BEST if n_subsets == 1 else 1]:
+        candidate = _converge(lambda mean, cov: _full_c_step(x, mean, cov, h, chunksize), mean, cov, MAX_C_STEPS)
+        if best is None or candidate[0] < best[0]:
+            best = candidate
+    _, mean, cov = best
+
+    # consistency at the normal distribution, and reweighting
+    mean, cov = _consistent(x, mean, cov, chunksize)
+    if reweight:
+        distances = hotelling_t2_scores(x, mean, CovarianceFactor(cov), chunksize)
+        quantile = chi2.ppf(0.975, p)
+        mean, cov = _accumulate_under(x, distances, quantile, chunksize)
+        # the covariance of a normal sample truncated at the quantile is shrunk by this factor
+        cov = cov * 0.975 / chi2.cdf(quantile, p + 2)
+    if columns is not None:
+        return pd.Series(mean, index=columns), pd.DataFrame(cov, index=columns, columns=columns)
+    return mean, cov
@@ -9,10 +9,572 @@ See:
 
 https://projecteuclid.org/euclid.aoms/1177732979
 """
+from collections import OrderedDict
+import hashlib
 from warnings import warn
 
 import numpy as np
-from scipy.stats import f
+import pandas as pd
+from scipy.linalg import cho_solve
+from scipy.linalg.lapack import dtrtrs
+from scipy.special import chdtrc, fdtrc
+
+from hotelling.profiling import profiled, stage
+
+CHUNKSIZE = 100_000  # rows per block for the chunked / streaming computations
+CHI2_RATIO = 1000  # n / p ratio above which approximation="auto" uses the asymptotic chi square distribution
+APPROXIMATIONS = ("auto", "f", "chi2")
+COVARIANCES = ("sample", "ledoit_wolf", "oas")
+SMALL_CELL = 32  # mean rows per (group, sample) cell under which hotelling_t2_grouped batches the cells
+
+
+def use_chi2(n, p, approximation="f"):
+    """use_chi2.
+
+    :param n: number of observations (array-like)
+    :param p: number of features (array-like)
+    :param approximation: "f", "chi2", or "auto" for chi2 when n / p > CHI2_RATIO
+    :return: bool (array), True where the chi square distribution is to be used
+    """
+    if approximation not in APPROXIMATIONS:
+        raise ValueError(f"Error: approximation must be one of {APPROXIMATIONS}, not {approximation}.")
+    if approximation == "auto":
+        return np.asarray(n) / np.asarray(p) > CHI2_RATIO
+    return np.full(np.broadcast(n, p).shape, approximation == "chi2")
+
+
+def t2_p_value(t2_stat, f_value, n, p, approximation="f"):
+    r"""t2_p_value.
+
+    p value of the T2 statistic. Under the null hypothesis, the f value follows an F distribution with p and n - p
+    degrees of freedom, and as n grows, T2 converges to a chi square distribution with p degrees of freedom, which
+    avoids evaluating the F distribution with extreme degrees of freedom. All parameters can be arrays, to compute
+    many p values at once.
+
+    :param t2_stat: T2 statistic
+    :param f_value: f value
+    :param n: degrees of freedom, see `hotelling_t2`
+    :param p: number of features
+    :param approximation: "f" (default), "chi2", or "auto" for chi2 when n / p > CHI2_RATIO
+    :return: p value, float or array
+    """
+    if np.ndim(t2_stat) == 0 and np.ndim(f_value) == 0 and np.ndim(n) == 0 and np.ndim(p) == 0:
+        # single test, skip the broadcasting and masks
+        if approximation not in APPROXIMATIONS:
+            raise ValueError(f"Error: approximation must be one of {APPROXIMATIONS}, not {approximation}.")
+        if approximation == "chi2" or (approximation == "auto" and n / p > CHI2_RATIO):
+            return float(chdtrc(p, max(t2_stat, 0)))
+        return float(fdtrc(p, n - p, max(f_value, 0)))
+    t2_stat, f_value, n, p = np.broadcast_arrays(*(np.asarray(v, dtype=float) for v in (t2_stat, f_value, n, p)))
+    chi2_mask = use_chi2(n, p, approximation)
+    p_value = np.empty(t2_stat.shape)
+    # survival functions of scipy.special, same values as scipy.stats chi2.sf and f.sf, without importing scipy.stats
+    p_value[chi2_mask] = chdtrc(p[chi2_mask], np.maximum(t2_stat[chi2_mask], 0))
+    p_value[~chi2_mask] = fdtrc(p[~chi2_mask], n[~chi2_mask] - p[~chi2_mask], np.maximum(f_value[~chi2_mask], 0))
+    return p_value if p_value.ndim else float(p_value)
+
+
+def _iter_chunks(x, chunksize=CHUNKSIZE):
+    """_iter_chunks.
+
+    Iterate over the rows of x as 2d float numpy arrays of at most `chunksize` rows. Dask dataframes are computed
+    one partition at a time, so only one block is ever held in memory. Each block is converted to float64 on its own,
+    float32 samples are not copied to float64 as a whole.
+
+    :param x: array-like, numpy array, pandas or dask dataframe
+    :param chunksize: max number of rows per block
+    :return: generator of 2d numpy arrays
+    """
+    try:
+        partitions = x.to_delayed()
+    except AttributeError:
+        partitions = [x]
+    for partition in partitions:
+        try:
+            partition = partition.compute()
+        except AttributeError:
+            pass
+        values = np.asarray(partition)
+        if values.ndim == 1:
+            values = values.reshape(-1, 1)
+        for start in range(0, values.shape[0], chunksize):
+            yield np.asarray(values[start:start + chunksize], dtype=float)
+
+
+class CovarianceFactor:
+    """CovarianceFactor.
+
+    Factorization of a covariance matrix S, computed once and reused to evaluate quadratic forms dᵀ S⁻¹ d and to
+    solve S x = b, without ever building the explicit inverse. Uses the Cholesky factor when S is positive definite,
+    else an eigen decomposition, dropping the null space, equivalent to the pseudo-inverse.
+
+    Can be passed in place of a covariance matrix S to `hotelling_t2`, `hotelling_t2_scores`, `control_chart` and
+    `T2Monitor`. See `factorize` for the cached constructor.
+
+    :param S: 2d array-like, covariance matrix (p, p)
+    """
+
+    def __init__(self, S):
+        """Factorize S."""
+        S = np.asarray(S, dtype=float)
+        self.p = self.rank = S.shape[0]
+        try:
+            self.lower = np.linalg.cholesky(S)
+            self.method = "cholesky"
+        except np.linalg.LinAlgError:
+            w, v = np.linalg.eigh(S)
+            keep = w > w.max(initial=0) * max(S.shape) * np.finfo(float).eps
+            self.lower = None
+            self.root = v[:, keep] / np.sqrt(w[keep])
+            self.rank = self.root.shape[1]
+            self.method = "eigen"
+
+    @classmethod
+    def from_cholesky(cls, lower):
+        """from_cholesky.
+
+        :param lower: 2d numpy array, lower triangular Cholesky factor of S (p, p), already computed
+        :return: CovarianceFactor, without factorizing S again
+        """
+        factor = cls.__new__(cls)
+        factor.p = factor.rank = lower.shape[0]
+        factor.lower = lower
+        factor.method = "cholesky"
+        return factor
+
+    def whiten(self, d):
+        """whiten.
+
+        :param d: deviations from the mean, (p) or (n, p)
+        :return: z (rank) or (n, rank), such that the squared norm of each row of z is d S⁻¹ dᵀ
+        """
+        d = np.asarray(d, dtype=float)
+        if self.lower is None:
+            return d @ self.root
+        # LAPACK triangular solve, scipy.linalg.solve_triangular validation costs more than the solve for small p
+        z, _ = dtrtrs(self.lower, d.T, lower=1)
+        return z.T
+
+    def mahalanobis(self, d):
+        """mahalanobis.
+
+        :param d: deviations from the mean, (p) or (n, p)
+        :return: squared Mahalanobis distance dᵀ S⁻¹ d, float for (p), array for (n, p)
+        """
+        z = self.whiten(d)
+        if z.ndim == 1:
+            return float(z @ z)
+        return np.einsum("ij,ij->i", z, z)
+
+    def solve(self, b):
+        """solve.
+
+        :param b: array-like, (p) or (p, k)
+        :return: S⁻¹ b (pseudo-inverse when S is singular)
+        """
+        b = np.asarray(b, dtype=float)
+        if self.lower is None:
+            return self.root @ (self.root.T @ b)
+        return cho_solve((self.lower, True), b, check_finite=False)
+
+
+FACTOR_CACHE_SIZE = 32  # number of covariance factorizations kept by `factorize`
+_factor_cache = OrderedDict()
+
+
+def _fingerprint(S):
+    """Key identifying the content of a covariance matrix, for the factorization cache."""
+    values = np.ascontiguousarray(S, dtype=float)
+    return values.shape, hashlib.blake2b(memoryview(values).cast("B"), digest_size=16).digest()
+
+
+def factorize(S):
+    """factorize.
+
+    Return the `CovarianceFactor` of S from a least recently used cache keyed by the content of S, so that repeated
+    tests against the same baseline skip the O(p³) factorization. A CovarianceFactor is returned as is.
+
+    :param S: 2d array-like, covariance matrix (p, p), or CovarianceFactor
+    :return: CovarianceFactor
+    """
+    if isinstance(S, CovarianceFactor):
+        return S
+    key = _fingerprint(S)
+    try:
+        _factor_cache.move_to_end(key)
+        return _factor_cache[key]
+    except KeyError:
+        pass
+    factor = CovarianceFactor(S)
+    _factor_cache[key] = factor
+    while len(_factor_cache) > FACTOR_CACHE_SIZE:
+        _factor_cache.popitem(last=False)
+    return factor
+
+
+def shrinkage_intensity(comoment, n, fourth=None, covariance="ledoit_wolf"):
+    r"""shrinkage_intensity.
+
+    Shrinkage intensity δ of the covariance matrix towards the scaled identity, for
+    :math:`(1 - δ) S + δ \frac{tr(S)}{p} I`, which is well conditioned even with more features than observations.
+    With Σ the maximum likelihood covariance (comoment / n):
+
+    - ledoit_wolf: δ = min(b², d²) / d², with d² = ‖Σ - μI‖² / p and b² = (Σ‖y‖⁴ - n ‖Σ‖²) / (n² p)
+    - oas: δ = min(1, (‖Σ‖² / p² + μ²) / ((n + 1)(‖Σ‖² / p² - μ² / p)))
+
+    where μ = tr(Σ) / p, ‖.‖ is the Frobenius norm and y are the centered observations.
+
+    See:
+        - Ledoit, O. & Wolf, M. (2004). A well-conditioned estimator for large-dimensional covariance matrices.
+          Journal of Multivariate Analysis, 88(2), 365-411.
+        - Chen, Y., Wiesel, A., Eldar, Y.C. & Hero, A.O. (2010). Shrinkage Algorithms for MMSE Covariance
+          Estimation. IEEE Transactions on Signal Processing, 58(10), 5016-5029.
+
+    :param comoment: 2d array, co-moment matrix (centered cross-products) of the sample(s)
+    :param n: number of observations
+    :param fourth: sum of ‖y‖⁴ over the centered observations, required for ledoit_wolf
+    :param covariance: "ledoit_wolf" or "oas"
+    :return: float, δ in [0, 1]
+    """
+    if covariance not in COVARIANCES:
+        raise ValueError(f"Error: covariance must be one of {COVARIANCES}, not {covariance}.")
+    if covariance == "sample":
+        return 0.0
+    sigma = np.asarray(comoment, dtype=float) / n
+    p = sigma.shape[0]
+    mu = np.trace(sigma) / p
+    norm_sq = float(np.einsum("ij,ij->", sigma, sigma))
+    if covariance == "oas":
+        alpha = norm_sq / p ** 2
+        denominator = (n + 1) * (alpha - mu ** 2 / p)
+        return 1.0 if denominator <= 0 else min(1.0, (alpha + mu ** 2) / denominator)
+    d_sq = (norm_sq - 2 * mu * np.trace(sigma) + p * mu ** 2) / p
+    if d_sq <= 0:
+        return 0.0
+    b_sq = max(0.0, (fourth - n * norm_sq) / (n ** 2 * p))
+    return min(b_sq, d_sq) / d_sq
+
+
+def shrink(s, intensity):
+    """shrink.
+
+    :param s: 2d array-like, covariance matrix (p, p)
+    :param intensity: shrinkage intensity δ in [0, 1], see `shrinkage_intensity`
+    :return: 2d numpy array, (1 - δ) S + δ tr(S) / p I
+    """
+    s = np.asarray(s, dtype=float)
+    p = s.shape[0]
+    return (1 - intensity) * s + np.identity(p) * (intensity * np.trace(s) / p)
+
+
+def hotelling_t2_scores(x, x_bar, S, chunksize=CHUNKSIZE):
+    r"""hotelling_t2_scores.
+
+    Compute the T2 statistic of each individual observation (row) against a mean vector and covariance matrix:
+
+    .. math::
+        T^2_i = (x_i - \\bar{x})^{T} S^{-1} (x_i - \\bar{x})
+
+    S is factorized only once (see `factorize`), and the rows are scored in vectorized blocks of `chunksize` rows,
+    so memory is bounded by the chunk size and not by the number of observations.
+
+    :param x: array-like, numpy array, pandas or dask dataframe (n, p)
+    :param x_bar: array-like, mean vector (p)
+    :param S: 2d array-like, covariance matrix (p, p), or CovarianceFactor
+    :param chunksize: max number of rows scored at once
+    :return: numpy array of n T2 values
+    """
+    x_bar = np.asarray(x_bar, dtype=float).ravel()
+    factor = factorize(S)
+    scores = [factor.mahalanobis(chunk - x_bar) for chunk in _iter_chunks(x, chunksize)]
+    return np.concatenate(scores) if scores else np.empty(0)
+
+
+class SufficientStats:
+    """SufficientStats.
+
+    Single pass accumulator of the sufficient statistics of a multivariate sample: the count, the mean vector
+    (column sums / n) and the co-moment matrix (centered cross-products). Blocks of rows are folded in with
+    `update` and two accumulators computed on separate partitions combine with `merge`, using the parallel
+    algorithm of Chan et al., which is numerically stable, unlike raw sums of squares.
+
+    The sums of ‖y‖² y and ‖y‖⁴ over the centered rows y are merged the same way, for the Ledoit-Wolf shrinkage
+    intensity, see `cov`.
+
+    An accumulator can be passed to `hotelling_t2`, `hotelling_dict` and `pooled_covariance_matrix` in place of
+    the samples themselves.
+
+    See:
+        - Chan, T.F., Golub, G.H. & LeVeque, R.J. (1979). Updating Formulae and a Pairwise Algorithm for Computing
+          Sample Variances. Technical Report STAN-CS-79-773, Stanford University.
+
+    :param columns: optional, feature names, used to label the covariance matrix
+    """
+
+    def __init__(self, columns=None):
+        """Initialize an empty accumulator."""
+        self.n = 0
+        self.mean = None
+        self.comoment = None
+        self.third = None
+        self.fourth = 0.0
+        self.columns = None if columns is None else list(columns)
+
+    @classmethod
+    def from_data(cls, x, chunksize=CHUNKSIZE):
+        """from_data.
+
+        Accumulate all the rows of x, one block (or dask partition) at a time.
+
+        :param x: array-like, numpy array, pandas or dask dataframe
+        :param chunksize: max number of rows per block
+        :return: SufficientStats
+        """
+        acc = cls(getattr(x, "columns", None))
+        for chunk in _iter_chunks(x, chunksize):
+            acc.update(chunk)
+        return acc
+
+    @property
+    def p(self):
+        """Number of features."""
+        return 0 if self.mean is None else self.mean.shape[0]
+
+    @property
+    def shape(self):
+        """Shape (n, p) of the accumulated sample."""
+        return self.n, self.p
+
+    @property
+    def sums(self):
+        """Column sums."""
+        return self.n * self.mean
+
+    def update(self, chunk):
+        """update.
+
+        Fold a block of observations into the accumulator.
+
+        :param chunk: 2d array-like (rows, p)
+        :return: self
+        """
+        chunk = np.asarray(chunk, dtype=float)
+        if chunk.ndim == 1:
+            chunk = chunk.reshape(-1, 1)
+        if chunk.shape[0] == 0:
+            return self
+        other = SufficientStats()
+        other.n = chunk.shape[0]
+        other.mean = chunk.mean(0)
+        centered = chunk - other.mean
+        other.comoment = centered.T @ centered
+        norms = np.einsum("ij,ij->i", centered, centered)
+        other.third = norms @ centered
+        other.fourth = float(norms @ norms)
+        return self.merge(other)
+
+    def _recentered(self, shift):
+        """Recenter the sums of ‖y‖² y and ‖y‖⁴ on mean + shift instead of mean."""
+        shift_sq = shift @ shift
+        comoment_shift = self.comoment @ shift
+        trace = np.trace(self.comoment)
+        third = self.third - 2 * comoment_shift - shift * (trace + self.n * shift_sq)
+        fourth = (
+            self.fourth - 4 * shift @ self.third + 4 * shift @ comoment_shift + 2 * shift_sq * trace
+            + self.n * shift_sq ** 2
+        )
+        return third, fourth
+
+    def merge(self, other):
+        """merge.
+
+        Combine with an accumulator computed on another partition of the same sample.
+
+        :param other: SufficientStats
+        :return: self
+        """
+        if other.n == 0:
+            return self
+        if self.n == 0:
+            self.n, self.mean, self.comoment = other.n, other.mean.copy(), other.comoment.copy()
+            self.third, self.fourth = other.third.copy(), other.fourth
+            if self.columns is None:
+                self.columns = other.columns
+            return self
+        if self.p != other.p:
+            raise ValueError(f"Error: cannot merge statistics with different number of features ({self.p} != {other.p}).")
+        n = self.n + other.n
+        delta = other.mean - self.mean
+        mean = self.mean + delta * (other.n / n)
+        third, fourth = self._recentered(mean - self.mean)
+        other_third, other_fourth = other._recentered(mean - other.mean)
+        self.third, self.fourth = third + other_third, fourth + other_fourth
+        self.mean = mean
+        self.comoment = self.comoment + other.comoment + np.outer(delta, delta) * (self.n * other.n / n)
+        self.n = n
+        return self
+
+    def cov(self, ddof=1, covariance="sample"):
+        """cov.
+
+        :param ddof: delta degrees of freedom, 1 (default) for the sample covariance
+        :param covariance: "sample" (default), or "ledoit_wolf" / "oas" for a shrinkage estimate,
+            see `shrinkage_intensity`
+        :return: 2d numpy array, the covariance matrix
+        """
+        s = self.comoment / (self.n - ddof)
+        if covariance == "sample":
+            return s
+        return shrink(s, shrinkage_intensity(self.comoment, self.n, self.fourth, covariance))
+
+
+def _as_dtype(x, dtype):
+    """Store the samples x (numpy array, pandas or dask dataframe) as dtype, without copy if they already are."""
+    if isinstance(x, np.ndarray):
+        return x.astype(dtype, copy=False)
+    if hasattr(x, "astype"):
+        return x.astype(dtype)
+    return np.asarray(x, dtype=dtype)
+
+
+def _labeled(s, columns):
+    """Label a covariance matrix with the feature names, as pandas would."""
+    if columns is None:
+        return s
+    return pd.DataFrame(s, index=columns, columns=columns)
+
+
+def _pooled_covariance_stats(x, y, bessel=True, covariance="sample"):
+    """Pooled covariance matrix from two SufficientStats, see `pooled_covariance_matrix`."""
+    if bessel:
+        n1, n2 = bessel_correction(x, y)
+    else:
+        n1, n2 = x.n, y.n
+    s = (n1 * x.cov() + n2 * y.cov()) / (n1 + n2)
+    if covariance == "sample":
+        return s
+    # intensity from the within samples co-moments, each sample centered on its own mean
+    return shrink(s, shrinkage_intensity(x.comoment + y.comoment, x.n + y.n, x.fourth + y.fourth, covariance))
+
+
+def _hotelling_t2_stats(x, y=None, bessel=True, S=None, approximation="f", covariance="sample"):
+    """_hotelling_t2_stats.
+
+    Same as `hotelling_t2`, computed from SufficientStats: x an accumulator, y an accumulator for the two sample
+    test, or None / mean vector for the one sample test.
+    """
+    nx, p = x.shape
+    if not isinstance(y, SufficientStats):
+        # One sample T-squared
+        mu = np.zeros(p) if y is None else np.asarray(y, dtype=float).ravel()
+        if mu.shape[0] != p:
+            warn(f"Error: the two samples must have the same number of features ({p} != {mu.shape[0]}).")
+            raise ValueError
+        with stage("covariance", x):
+            cov = x.cov(covariance=covariance) if S is None else S
+        with stage("solve"):
+            t2_stat = nx * (CovarianceFactor(cov) if S is None else factorize(S)).mahalanobis(x.mean - mu)
+        if S is not None:
+            return t2_stat
+        f_value = (nx - p) * t2_stat / ((nx - 1) * p)
+        with stage("p_value"):
+            p_value = t2_p_value(t2_stat, f_value, nx, p, approximation)
+        return t2_stat, f_value, p_value, _labeled(cov, x.columns)
+
+    # Two sample T-squared
+    ny, py = y.shape
+    if p != py:
+        warn(f"Error: the two samples must have the same number of features ({p} != {py}).")
+        raise ValueError
+    if bessel:
+        n = nx + ny - 2
+    else:
+        n = nx + ny
+    with stage("covariance", x, y):
+        s = _pooled_covariance_stats(x, y, bessel, covariance)
+    with stage("solve"):
+        t2_stat = nx * ny / (nx + ny) * CovarianceFactor(s).mahalanobis(x.mean - y.mean)
+    f_value = (nx + ny - p - 1) * t2_stat / (n * p)
+    with stage("p_value"):
+        p_value = t2_p_value(t2_stat, f_value, n, p, approximation)
+    return t2_stat, f_value, p_value, _labeled(s, x.columns)
+
+
+def _backend(x):
+    """_backend.
+
+    :param x: samples of observations
+    :return: "stats" for SufficientStats, "dask" for dask collections, "numpy" for numpy arrays, else "pandas"
+    """
+    if isinstance(x, np.ndarray):
+        return "numpy"
+    if isinstance(x, SufficientStats):
+        return "stats"
+    if hasattr(x, "to_delayed"):
+        return "dask"
+    return "pandas"
+
+
+def _mean(x):
+    """Column means of a 2d float numpy array, as a BLAS matrix-vector product (faster than x.mean for small x)."""
+    return np.ones(x.shape[0]) @ x / x.shape[0]
+
+
+def _pooled_covariance_numpy(x, x_bar, y, y_bar, bessel=True):
+    """Pooled covariance matrix of two 2d float numpy arrays, given their means, see `pooled_covariance_matrix`."""
+    nx, ny = x.shape[0], y.shape[0]
+    n1, n2 = (nx - 1, ny - 1) if bessel else (nx, ny)
+    centered_x, centered_y = x - x_bar, y - y_bar
+    comoment_x, comoment_y = centered_x.T @ centered_x, centered_y.T @ centered_y
+    return (n1 / (nx - 1) * comoment_x + n2 / (ny - 1) * comoment_y) / (n1 + n2)
+
+
+def _hotelling_t2_numpy(x, y=None, bessel=True, S=None, approximation="f"):
+    """_hotelling_t2_numpy.
+
+    Same as `hotelling_t2`, for x a 2d numpy array, y a 2d array or None / mean vector. No dataframe, no speculative
+    compute, float64 inputs are not copied (only centered), for the small and frequent tests.
+    """
+    x = np.asarray(x, dtype=float)
+    nx, p = x.shape
+    with stage("means", x):
+        x_bar = _mean(x)
+    if y is None or np.ndim(y) < 2:
+        # One sample T-squared
+        mu = np.zeros(p) if y is None else np.asarray(y, dtype=float).ravel()
+        if mu.shape[0] != p:
+            warn(f"Error: the two samples must have the same number of features ({p} != {mu.shape[0]}).")
+            raise ValueError
+        if S is not None:
+            with stage("solve"):
+                return nx * factorize(S).mahalanobis(x_bar - mu)
+        with stage("covariance", x):
+            centered = x - x_bar
+            cov = centered.T @ centered / (nx - 1)
+        with stage("solve"):
+            t2_stat = nx * CovarianceFactor(cov).mahalanobis(x_bar - mu)
+        f_value = (nx - p) * t2_stat / ((nx - 1) * p)
+        with stage("p_value"):
+            p_value = t2_p_value(t2_stat, f_value, nx, p, approximation)
+        return t2_stat, f_value, p_value, cov
+
+    # Two sample T-squared
+    y = np.asarray(y, dtype=float)
+    ny, py = y.shape
+    if p != py:
+        warn(f"Error: the two samples must have the same number of features ({p} != {py}).")
+        raise ValueError
+    with stage("means", y):
+        y_bar = _mean(y)
+    n = nx + ny - 2 if bessel else nx + ny
+    with stage("pooled_covariance_matrix", x, y):
+        s = _pooled_covariance_numpy(x, x_bar, y, y_bar, bessel)
+    with stage("solve"):
+        t2_stat = nx * ny / (nx + ny) * CovarianceFactor(s).mahalanobis(x_bar - y_bar)
+    f_value = (nx + ny - p - 1) * t2_stat / (n * p)
+    with stage("p_value"):
+        p_value = t2_p_value(t2_stat, f_value, n, p, approximation)
+    return t2_stat, f_value, p_value, s
 
 
 def bessel_correction(x, y=None):
@@ -42,26 +604,24 @@ def bessel_correction(x, y=None):
     return n1, n2
 
 
-def inverse_covariance_matrix(x, y, bessel=True):
+def inverse_covariance_matrix(x, y, bessel=True, covariance="sample"):
     """inverse_covariance_matrix.
 
     :param x: array-like, samples of observations
     :param y: array-like, samples of observations
     :param bessel: bool, apply bessel correction (default)
+    :param covariance: "sample" (default), "ledoit_wolf" or "oas", see `pooled_covariance_matrix`
     :return: float, the pooled variance inverse, the pooled variance
     """
     _, *p = x.shape
     p = p[0] if p else 1
-    s = pooled_covariance_matrix(x, y, bessel)
-    try:
-        ident_p = np.identity(p).compute
-    except AttributeError:
-        ident_p = np.identity(p)
-    inv = np.linalg.solve(s, ident_p)
+    s = pooled_covariance_matrix(x, y, bessel, covariance=covariance)
+    inv = CovarianceFactor(s).solve(np.identity(p))
     return inv, s
 
 
-def pooled_covariance_matrix(x, y, bessel=True):
+@profiled("pooled_covariance_matrix", data_args=2)
+def pooled_covariance_matrix(x, y, bessel=True, workers=None, covariance="sample", dtype=None):
     r"""pooled_covariance.
 
     Compute the pooled covariance matrix
@@ -82,11 +642,29 @@ def pooled_covariance_matrix(x, y, bessel=True):
     ---------
     see: https://en.wikipedia.org/wiki/Hotelling%27s_T-squared_distribution#Pooled_covariance_matrix
 
-    :param x: array-like, samples of observations
-    :param y: array-like, samples of observations
+    :param x: array-like or SufficientStats, samples of observations
+    :param y: array-like or SufficientStats, samples of observations
     :param bessel: bool, apply bessel correction (default)
-    :return: float, the pooled variance
+    :param workers: number of processes to compute the statistics of numpy / pandas samples (optional)
+    :param covariance: "sample" (default), or "ledoit_wolf" / "oas" to shrink the pooled covariance towards the
+        scaled identity, with the intensity computed in the same pass over the samples, see `shrinkage_intensity`
+    :param dtype: storage dtype of the samples (optional), see `hotelling_t2`
+    :return: the pooled covariance matrix, a dataframe labeled with the features for dataframe samples
     """
+    if dtype is not None and not isinstance(x, SufficientStats):
+        x, y = _as_dtype(x, dtype), _as_dtype(y, dtype)
+    if workers and not isinstance(x, SufficientStats):
+        from hotelling.parallel import parallel_stats
+
+        x, y = parallel_stats(x, workers, dtype=dtype or float), parallel_stats(y, workers, dtype=dtype or float)
+    elif (covariance != "sample" or dtype is not None) and not isinstance(x, SufficientStats):
+        x, y = SufficientStats.from_data(x), SufficientStats.from_data(y)
+    if isinstance(x, SufficientStats):
+        # labeled with the feature names of dataframe samples, like the pandas sample covariance
+        return _labeled(_pooled_covariance_stats(x, y, bessel, covariance), x.columns)
+    if _backend(x) == "numpy" and _backend(y) == "numpy" and x.ndim == 2 and y.ndim == 2:
+        x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+        return _pooled_covariance_numpy(x, _mean(x), y, _mean(y), bessel)
     if bessel:
         n1, n2 = bessel_correction(x, y)
     else:
@@ -108,11 +686,16 @@ def pooled_covariance_matrix(x, y, bessel=True):
     except AttributeError:
         s2 = n2 * np.cov(y, rowvar=False)
     s = (s1 + s2) / (n1 + n2)
-
+    if isinstance(s, np.ndarray):
+        return _labeled(s, getattr(x, "columns", None))
     return s
 
 
-def hotelling_t2(x, y=None, bessel=True, S=None):
+@profiled("hotelling_t2", data_args=2)
+def hotelling_t2(
+    x, y=None, bessel=True, S=None, workers=None, permutations=None, random_state=None, approximation="f",
+    covariance="sample", dtype=None,
+):
     r"""hotelling_t2.
 
     Compute the Hotelling (T2) test statistic.
@@ -148,9 +731,29 @@ def hotelling_t2(x, y=None, bessel=True, S=None):
           In: Kotz S., Johnson N.L. (eds) Breakthroughs in Statistics.
           Springer Series in Statistics (Perspectives in Statistics). Springer, New York, NY
 
+    Dask dataframes are reduced to `SufficientStats` in a single pass over their partitions. With `workers`, numpy
+    arrays and pandas dataframes are reduced by a pool of processes (see `hotelling.parallel`). SufficientStats can
+    also be passed directly for x and y. 2d numpy arrays (and lists) go through a dedicated numpy kernel, without
+    dataframes, which is the fastest path for small samples tested at a high rate: convert with `df.to_numpy()`.
+
     :param x: array-like, samples of observations for one or two sample test (required)
     :param y: for two sample test, array-like, samples of observations (optional), for one sample, list of means to test
     :param bessel: bool, apply bessel correction (default)
+    :param S: covariance matrix or CovarianceFactor to use for the one sample test (optional), only the t2 statistic
+        is returned. Factorizations of S are cached, see `factorize`.
+    :param workers: number of processes to compute the statistics of numpy / pandas samples (optional)
+    :param permutations: for two sample test, number of permutations (optional), to compute the p value by
+        permutation instead of the F distribution, see `hotelling.resampling.permutation_test`. Permutations are of
+        the sample pooled covariance statistic, they can't be combined with a shrinkage covariance.
+    :param random_state: seed for the permutations (optional)
+    :param approximation: distribution for the p value, "f" (default), "chi2" for the large sample chi square
+        approximation, or "auto" for chi2 when n / p > CHI2_RATIO, see `t2_p_value`
+    :param covariance: "sample" (default), or "ledoit_wolf" / "oas" for a shrinkage estimate of the (pooled)
+        covariance, well conditioned when there are many features for few observations, see `shrinkage_intensity`
+    :param dtype: storage dtype of the samples (optional), for example np.float32 to halve memory and bandwidth for
+        wide data: the samples are kept (or cast once) in dtype and reduced in blocks, each block converted to float64
+        for the sums and cross-products, see `SufficientStats`. By default, numpy and pandas compute the covariance
+        in float64, copying float32 samples.
     :return:
         statistic: float,
             the t2 statistic
@@ -161,24 +764,65 @@ def hotelling_t2(x, y=None, bessel=True, S=None):
         s: 2d array,
             the pooled variance
     """  # noqa: W605
-    try:
-        nx, p = x.shape
-    except AttributeError as ex:
-        if "list" in str(ex):
-            x = np.asarray(x)
-            nx, *p = x.shape
-            p = p[0] if p else 1
-            y = np.asarray(y)
-        else:
-            warn("Error: The two samples must be in arrays or dataframes format.")
+    if permutations:
+        if y is None or np.ndim(y) != 2:
+            warn("Error: the permutation test requires two samples.")
             raise ValueError
+        if covariance != "sample":
+            raise ValueError("Error: permutations can't be combined with a shrinkage covariance.")
+        from hotelling.resampling import permutation_test
 
-    # samples observed means
+        if dtype is not None:
+            # the statistic and its permutations, of the same values
+            x, y = _as_dtype(x, dtype), _as_dtype(y, dtype)
+        t2_stat, f_value, _, s = hotelling_t2(x, y, bessel, workers=workers, approximation=approximation, dtype=dtype)
+        _, p_value = permutation_test(x, y, permutations, random_state=random_state, workers=workers)
+        return t2_stat, f_value, p_value, s
+    if covariance not in COVARIANCES:
+        raise ValueError(f"Error: covariance must be one of {COVARIANCES}, not {covariance}.")
+    if isinstance(x, (list, tuple)):
+        x = np.asarray(x, dtype=float)
+    if isinstance(y, (list, tuple)):
+        y = np.asarray(y, dtype=float)
+    backend = _backend(x)
+    if dtype is not None and backend != "stats":
+        x = _as_dtype(x, dtype)
+        if y is not None and np.ndim(y) == 2:
+            y = _as_dtype(y, dtype)
+    chunked = covariance != "sample" or dtype is not None
+    if backend == "dask" or (chunked and not workers and backend != "stats"):
+        # dask, shrinkage intensity or storage dtype, accumulate in a single pass over the partitions / blocks
+        with stage("sufficient_stats", x):
+            x = SufficientStats.from_data(x)
+            if y is not None and np.ndim(y) == 2:
+                y = SufficientStats.from_data(y)
+    elif workers and backend != "stats":
+        from hotelling.parallel import parallel_stats
+
+        with stage("sufficient_stats", x):
+            x = parallel_stats(x, workers, dtype=dtype or float)
+            if y is not None and np.ndim(y) == 2:
+                y = parallel_stats(y, workers, dtype=dtype or float)
+    if isinstance(x, SufficientStats):
+        return _hotelling_t2_stats(x, y, bessel, S, approximation, covariance)
+    if backend == "numpy" and x.ndim == 2:
+        return _hotelling_t2_numpy(x, y, bessel, S, approximation)
+
+    # pandas dataframes (and univariate samples)
     try:
-        nx = nx.compute()
-        x_bar = x.mean(0).compute()
-    except AttributeError:  # series has no attribute compute
-        x_bar = x.mean(0)
+        nx, *p = x.shape
+    except AttributeError:
+        warn("Error: The two samples must be in arrays or dataframes format.")
+        raise ValueError
+    p = p[0] if p else 1
+
+    # samples observed means
+    with stage("means", x):
+        try:
+            nx = nx.compute()
+            x_bar = x.mean(0).compute()
+        except AttributeError:  # series has no attribute compute
+            x_bar = x.mean(0)
 
     one_sample = False
     if y is None:
@@ -198,11 +842,12 @@ def hotelling_t2(x, y=None, bessel=True, S=None):
         else:
             # Two sample T-squared
             py = py[0] if py else 1
-            try:
-                ny = ny.compute()
-                y_bar = y.mean(0).compute()
-            except AttributeError:  # series has no attribute compute
-                y_bar = y.mean(0)
+            with stage("means", y):
+                try:
+                    ny = ny.compute()
+                    y_bar = y.mean(0).compute()
+                except AttributeError:  # series has no attribute compute
+                    y_bar = y.mean(0)
             # difference of means
             diff_bar = x_bar - y_bar
     if p != py:
@@ -223,51 +868,169 @@ def hotelling_t2(x, y=None, bessel=True, S=None):
         n = n1 + n2
 
     # calculate the T2 statistics
-    # Technically, we use diff_bar.T for the transpose, but with Pandas, a 1 dimensional dataframe
-    # is automatically aligned for @ and is not required
+    # diff_bar.T S^-1 diff_bar is evaluated through the factorization of S, without computing its inverse
     if one_sample:
         if S is not None:
             cov = S
         else:
-            try:
-                cov = x.cov().compute()
-            except AttributeError:
+            with stage("covariance", x):
                 try:
-                    cov = x.cov()
+                    cov = x.cov().compute()
                 except AttributeError:
-                    cov = np.cov(x, rowvar=False)
-        inv_cov = np.linalg.pinv(cov)
-        # for f test
-        # term = (n - p) / (p * (n - 1))  # getting different results
-        t2_stat = n * (diff_bar.T @ inv_cov @ diff_bar)
+                    try:
+                        cov = x.cov()
+                    except AttributeError:
+                        cov = np.cov(x, rowvar=False)
+        with stage("solve"):
+            factor = CovarianceFactor(cov) if S is None else factorize(S)
+            # for f test
+            # term = (n - p) / (p * (n - 1))  # getting different results
+            t2_stat = n * factor.mahalanobis(diff_bar)
         if S is not None:
             return t2_stat
         # f statistic
-        # TODO: use chi square instead of f statistic for large sample
         f_value = (n - p) * t2_stat / ((n - 1) * p)
     else:
         # pooled covariance
-        inv_s, s = inverse_covariance_matrix(x, y, bessel)
-        t2_stat = nx * ny / (nx + ny) * (diff_bar.T @ inv_s @ diff_bar)
+        s = pooled_covariance_matrix(x, y, bessel)
+        with stage("solve"):
+            t2_stat = nx * ny / (nx + ny) * CovarianceFactor(s).mahalanobis(diff_bar)
         # f statistic
-        # TODO: use chi square instead of f statistic for large sample
         f_value = (nx + ny - p - 1) * t2_stat / (n * p)
 
-    # p-value
-    p_value = f.sf(f_value, p, n - p)  # survival function, 1 - cdf
+    # p-value, survival function (1 - cdf) of F, or of chi square for large samples
+    with stage("p_value"):
+        p_value = t2_p_value(t2_stat, f_value, n, p, approximation)
 
     # return the list of results
     return t2_stat, f_value, p_value, cov if one_sample else s
 
 
-def hotelling_dict(x, y=None, bessel=True):
+def hotelling_dict(
+    x, y=None, bessel=True, workers=None, permutations=None, random_state=None, approximation="f",
+    covariance="sample", dtype=None,
+):
     """hotelling_dict.
 
     returns the same values as `hotelling_t2`, but in a dictionary - for API etc
 
     :param x: array-like, samples of observations for one or two sample test (required)
     :param y: for two sample test, array-like, samples of observations (optional), for one sample, list of means to test
+    :param bessel: bool, apply bessel correction (default)
+    :param workers: number of processes to compute the statistics of numpy / pandas samples (optional)
+    :param permutations: for two sample test, number of permutations to compute the p value (optional)
+    :param random_state: seed for the permutations (optional)
+    :param approximation: distribution for the p value, "f" (default), "chi2" or "auto", see `t2_p_value`
+    :param covariance: "sample" (default), "ledoit_wolf" or "oas", see `hotelling_t2`
+    :param dtype: storage dtype of the samples (optional), see `hotelling_t2`
     :return: dict
     """
-    t2_stat, f_stat, p_value, s = hotelling_t2(x, y, bessel)
+    t2_stat, f_stat, p_value, s = hotelling_t2(
+        x, y, bessel, workers=workers, permutations=permutations, random_state=random_state,
+        approximation=approximation, covariance=covariance, dtype=dtype,
+    )
     return dict(t2_stat=t2_stat, f_stat=f_stat, p_value=p_value, pooled_var=s)
+
+
+def _segment_starts(codes):
+    """Start positions of the runs of equal values in a sorted array of group codes."""
+    return np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+
+
+def hotelling_t2_grouped(
+    df, by, sample_col, columns=None, x_value=None, bessel=True, chunksize=CHUNKSIZE, approximation="f"
+):
+    """hotelling_t2_grouped.
+
+    Two sample Hotelling T2 test for each group of a dataframe, in one call. The rows are sorted once by group, the
+    means and co-moments of every (group, sample) cell are computed with segmented sums, the T2 of all groups are
+    solved as one stacked linear system and the F and p values are computed as vectors.
+
+    Groups that don't have observations for both samples are not reported, nor are rows with a missing group or
+    sample, as with pandas groupby.
+
+    :param df: pandas dataframe
+    :param by: column name or list of column names to group by
+    :param sample_col: column identifying the sample of each row, with two distinct values
+    :param columns: feature columns (optional), defaults to all the other numeric columns
+    :param x_value: value of sample_col identifying the x sample (optional), defaults to the first in sorted order
+    :param bessel: bool, apply bessel correction (default)
+    :param chunksize: max number of rows per block for the co-moments, blocks of small groups hold at most
+        chunksize values of their outer products
+    :param approximation: distribution for the p values, "f" (default), "chi2" or "auto", see `t2_p_value`
+    :return: dataframe indexed by group, with columns nx, ny, t2_stat, f_stat and p_value
+    """
+    by = [by] if isinstance(by, str) else list(by)
+    # rows without a group have no group code, drop them as groupby(dropna=True) does
+    df = df.dropna(subset=by + [sample_col])
+    if columns is None:
+        columns = [col for col in df.select_dtypes("number").columns if col not in by and col != sample_col]
+    samples = sorted(df[sample_col].unique())
+    if len(samples) != 2:
+        warn(f"Error: {sample_col} must identify exactly two samples, found {len(samples)}.")
+        raise ValueError
+    x_value = samples[0] if x_value is None else x_value
+
+    grouper = df.groupby(by + [sample_col], sort=True)
+    codes = grouper.ngroup().to_numpy()
+    cells = grouper.size().index.to_frame(index=False)
+    order = np.argsort(codes, kind="stable")
+    codes = codes[order]
+    values = df[columns].to_numpy(dtype=float)[order]
+    p = values.shape[1]
+
+    # per cell counts, means and co-moments, with segmented sums over the sorted rows
+    starts = _segment_starts(codes)
+    counts = np.diff(np.r_[starts, len(codes)])
+    means = np.add.reduceat(values, starts, axis=0) / counts[:, np.newaxis]
+    comoments = np.zeros((len(starts), p, p))
+    if counts.mean() < SMALL_CELL:
+        # many small cells, summed outer products of the rows, chunksize values per block
+        step = max(1, chunksize // max(p * p, 1))
+        for start in range(0, len(codes), step):
+            block = values[start:start + step] - means[codes[start:start + step]]
+            block_starts = _segment_starts(codes[start:start + step])
+            comoments[codes[start + block_starts]] += np.add.reduceat(
+                np.einsum("ij,ik->ijk", block, block), block_starts, axis=0
+            )
+    else:
+        for cell, (start, stop) in enumerate(zip(starts, np.r_[starts[1:], len(codes)])):
+            for block_start in range(start, stop, chunksize):
+                block = values[block_start:min(block_start + chunksize, stop)] - means[cell]
+                comoments[cell] += block.T @ block
+
+    cells["cell"] = np.arange(len(cells))
+    pairs = pd.concat(
+        [
+            cells[cells[sample_col] == x_value].set_index(by)["cell"],
+            cells[cells[sample_col] != x_value].set_index(by)["cell"],
+        ],
+        axis=1,
+        keys=["x", "y"],
+        join="inner",
+    )
+    ix, iy = pairs["x"].to_numpy(), pairs["y"].to_numpy()
+    nx, ny = counts[ix].astype(float), counts[iy].astype(float)
+
+    # stacked pooled covariances
+    if bessel:
+        n = nx + ny - 2
+        s = (comoments[ix] + comoments[iy]) / n[:, np.newaxis, np.newaxis]
+    else:
+        n = nx + ny
+        s = (
+            comoments[ix] * (nx / (nx - 1))[:, np.newaxis, np.newaxis]
+            + comoments[iy] * (ny / (ny - 1))[:, np.newaxis, np.newaxis]
+        ) / n[:, np.newaxis, np.newaxis]
+    diff = means[ix] - means[iy]
+    try:
+        solved = np.linalg.solve(s, diff[:, :, np.newaxis])[:, :, 0]
+    except np.linalg.LinAlgError:
+        solved = np.einsum("gij,gj->gi", np.linalg.pinv(s), diff)
+    t2_stat = nx * ny / (nx + ny) * np.einsum("gi,gi->g", diff, solved)
+    f_value = (nx + ny - p - 1) * t2_stat / (n * p)
+    p_value = t2_p_value(t2_stat, f_value, n, p, approximation)
+    return pd.DataFrame(
+        dict(nx=nx.astype(int), ny=ny.astype(int), t2_stat=t2_stat, f_stat=f_value, p_value=p_value),
+        index=pairs.index,
+    )
@@ -31,7 +31,7 @@ setup(
         "Programming Language :: Python :: 3.9",
     ],
     description="Hotelling implements one and two sample Hotelling T2 tests and control charts",
-    entry_points={"console_scripts": ["hotelling=hotelling.cli:main"]},
+    entry_points={"console_scripts": ["hotelling=hotelling.cli:main", "hotelling-batch=hotelling.cli:batch"]},
     install_requires=requirements,
     license="MIT license",
     long_description=readme + "\n\n" + history,
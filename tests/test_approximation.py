@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+from scipy import stats
+
+from hotelling import stats as hstats
+from hotelling.helpers import load_df
+from hotelling.plots import control_interval
+from hotelling.stats import hotelling_t2, t2_p_value
+
+
+def test_chi2_p_value():
+    x = load_df('data/swiss_real.csv')
+    y = load_df('data/swiss_fake.csv')
+    t2, f_value, p_value, _ = hotelling_t2(x, y, approximation="chi2")
+    assert round(t2, 4) == 2412.4507
+    assert p_value == stats.chi2.sf(t2, 6)
+    assert hotelling_t2(x, y, approximation="f")[2] == hotelling_t2(x, y)[2]
+
+
+def test_auto_switch(monkeypatch):
+    x = load_df('data/sweat.dat')
+    mu = np.asarray([4, 50, 10])
+    t2 = hotelling_t2(x, mu)[0]
+    assert hotelling_t2(x, mu, approximation="auto")[2] == hotelling_t2(x, mu)[2]
+    monkeypatch.setattr(hstats, "CHI2_RATIO", 5)
+    assert hotelling_t2(x, mu, approximation="auto")[2] == stats.chi2.sf(t2, 3)
+
+
+def test_vectorized_p_value():
+    t2 = np.asarray([1.0, 5.0, 10.0])
+    n = np.asarray([20, 20_000, 20])
+    f_value = (n - 3) * t2 / ((n - 1) * 3)
+    res = t2_p_value(t2, f_value, n, 3, approximation="auto")
+    assert res[1] == stats.chi2.sf(5.0, 3)
+    assert res[2] == stats.f.sf(f_value[2], 3, 17)
+
+
+def test_bad_approximation():
+    with pytest.raises(ValueError):
+        t2_p_value(1.0, 1.0, 10, 2, approximation="normal")
+
+
+def test_control_interval_chi2():
+    exact = control_interval(10 ** 7, 10 ** 7, 5, phase=2)
+    approx = control_interval(10 ** 7, 10 ** 7, 5, phase=2, approximation="auto")
+    np.testing.assert_allclose(approx, exact, rtol=1e-4)
+    assert approx == tuple(stats.chi2(5).ppf([0.0005, 0.5, 0.9995]))
+    assert control_interval(200, 200, 6, approximation="auto") == control_interval(200, 200, 6)
@@ -0,0 +1,47 @@
+import json
+import os
+
+import pytest
+from click.testing import CliRunner
+
+from hotelling.batch import read_manifest, run_batch
+from hotelling.cli import batch
+
+DATA = os.path.abspath('data')
+
+
+def test_read_manifest_globs(tmp_path):
+    manifest = tmp_path / 'jobs.json'
+    manifest.write_text(json.dumps({"jobs": [
+        {"id": "swiss", "x": os.path.join(DATA, 'swiss_*.csv'), "y": os.path.join(DATA, 'swiss_fake.csv')},
+        {"x": os.path.join(DATA, 'swiss_real.csv')},
+    ]}))
+    jobs = read_manifest(str(manifest))
+    ids = ['swiss/swiss_fake.csv', 'swiss/swiss_real.csv', os.path.join(DATA, 'swiss_real.csv')]
+    assert [job["id"] for job in jobs] == ids
+    assert jobs[2]["y"] is None
+    manifest.write_text(json.dumps([{"x": os.path.join(DATA, 'swiss_*.csv'), "y": os.path.join(DATA, 'nothing*.csv')}]))
+    with pytest.raises(ValueError):
+        read_manifest(str(manifest))
+
+
+@pytest.mark.parametrize("backend", ["pandas", "chunked"])
+def test_run_batch(backend):
+    jobs = [dict(id='a', x=os.path.join(DATA, 'swiss_real.csv'), y=os.path.join(DATA, 'swiss_fake.csv'))]
+    record, = run_batch(jobs, backend, chunksize=17, workers=1)
+    assert round(record["t2_stat"], 4) == 2412.4507
+    assert record["columns"] == ['p1', 'p2', 'p3', 'p4', 'p5', 'p6']
+    assert len(record["pooled_var"]) == 6
+
+
+def test_batch_cli(tmp_path):
+    manifest = tmp_path / 'jobs.csv'
+    real, fake = os.path.join(DATA, 'swiss_real.csv'), os.path.join(DATA, 'swiss_fake.csv')
+    manifest.write_text(f"id,x,y\none,{real},{fake}\ntwo,{fake},{real}\nmissing,{tmp_path / 'nope.csv'},\n")
+    result = CliRunner().invoke(batch, [str(manifest), '--workers', '2', '--no-cov'])
+    assert result.exit_code == 1  # one job failed
+    records = {record["id"]: record for record in map(json.loads, result.output.splitlines())}
+    assert set(records) == {'one', 'two', 'missing'}
+    assert records['one']['t2_stat'] == pytest.approx(records['two']['t2_stat'])
+    assert 'pooled_var' not in records['one']
+    assert records['missing']['error'].startswith('FileNotFoundError')
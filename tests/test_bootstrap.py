@@ -0,0 +1,40 @@
+import numpy as np
+
+from hotelling.helpers import load_df
+from hotelling.parallel import shared_memory
+from hotelling.resampling import _resample_counts, _weighted_moments, bootstrap_ci
+
+
+def test_weighted_moments_match_resampled_rows():
+    x = load_df('data/swiss_real.csv').values
+    counts = _resample_counts(np.random.default_rng(0), 3, len(x))
+    assert (counts.sum(1) == len(x)).all()
+    means, cov = _weighted_moments(x, counts)
+    for i in range(3):
+        resampled = np.repeat(x, counts[i].astype(int), axis=0)
+        np.testing.assert_allclose(means[i], resampled.mean(0))
+        np.testing.assert_allclose(cov[i], np.cov(resampled, rowvar=False))
+
+
+def test_bootstrap_two_sample():
+    x = load_df('data/swiss_real.csv')
+    y = load_df('data/swiss_fake.csv')
+    res = bootstrap_ci(x, y, n_resamples=200, random_state=0, task_size=64)
+    assert round(res["t2_stat"], 4) == 2412.4507
+    assert res["t2_ci"][0] < res["t2_stat"] < res["t2_ci"][1]
+    assert list(res["mean_diff_ci"].index) == list(x.columns)
+    np.testing.assert_allclose(res["mean_diff"], x.mean() - y.mean())
+    assert ((res["mean_diff_ci"]["low"] < res["mean_diff"]) & (res["mean_diff"] < res["mean_diff_ci"]["high"])).all()
+
+
+def test_bootstrap_one_sample_reproducible():
+    x = load_df('data/shoes.csv', index_col='Subject').values
+    mu = np.asarray([7, 8, 5, 7, 9])
+    res = bootstrap_ci(x, mu, n_resamples=100, random_state=3, task_size=40)
+    assert round(res["t2_stat"], 4) == 52.6724
+    np.testing.assert_allclose(res["mean_diff"], x.mean(0) - mu)
+    assert res["mean_diff_ci"].shape == (5, 2)
+    again = bootstrap_ci(x, mu, n_resamples=100, random_state=3, task_size=40,
+                         workers=2 if shared_memory is not None else None)
+    np.testing.assert_allclose(res["t2_ci"], again["t2_ci"])
+    np.testing.assert_allclose(res["mean_diff_ci"], again["mean_diff_ci"])
@@ -0,0 +1,24 @@
+import os
+import subprocess
+import sys
+
+from click.testing import CliRunner
+
+import hotelling
+from hotelling.cli import main
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(hotelling.__file__)))
+
+
+def test_cli_does_not_import_plotting_backends():
+    code = "import sys, hotelling.cli; print(' '.join(sys.modules))"
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    modules = subprocess.run([sys.executable, "-c", code], capture_output=True, check=True, env=env).stdout.decode().split()
+    for heavy in ("matplotlib", "plotly", "dask", "distributed", "scipy.stats", "hotelling.plots"):
+        assert heavy not in modules
+
+
+def test_cli_stats():
+    result = CliRunner().invoke(main, ["--x", "data/swiss_real.csv", "--y", "data/swiss_fake.csv"])
+    assert result.exit_code == 0
+    assert "'t2_stat': 2412.45" in result.output
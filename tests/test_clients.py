@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+
+from hotelling import helpers
+from hotelling.helpers import close_clients, get_client, load_df, register_client
+from hotelling.stats import hotelling_t2
+
+distributed = pytest.importorskip("distributed")
+
+
+def test_external_client_reused():
+    client = distributed.Client(processes=False, n_workers=1, threads_per_worker=1, dashboard_address=None)
+    try:
+        x = load_df('data/shoes.csv', client=client, index_col='Subject')
+        assert hasattr(x, 'to_delayed')
+        assert round(hotelling_t2(x, np.asarray([7, 8, 5, 7, 9]))[0], 4) == 52.6724
+        address = client.scheduler.address
+        assert get_client(address) is client
+        assert register_client(client, 'cluster') is client
+        assert get_client('cluster') is client
+        close_clients()  # not owned, left open
+        assert client.status == 'running'
+        assert helpers._clients == {}
+    finally:
+        client.close()
+
+
+def test_localhost_client_started_once(monkeypatch):
+    created = []
+
+    class FakeClient:
+        status = 'running'
+
+        def __init__(self, *args):
+            created.append(args)
+
+        def nthreads(self):
+            return {}
+
+        def close(self):
+            self.status = 'closed'
+
+    monkeypatch.setattr(distributed, 'Client', FakeClient)
+    first = get_client('localhost')
+    assert get_client('localhost') is first
+    assert created == [()]
+    close_clients()
+    assert first.status == 'closed'
+    assert get_client('localhost') is not first
+    close_clients()
+
+
+def test_owned_client_replaced(monkeypatch):
+    class FakeClient:
+        status = 'running'
+
+        def __init__(self, *args):
+            pass
+
+        def nthreads(self):
+            return {}
+
+        def close(self):
+            self.status = 'closed'
+
+    monkeypatch.setattr(distributed, 'Client', FakeClient)
+    owned = get_client('cluster')
+    # registering the owned client again keeps it owned
+    register_client(owned, 'cluster')
+    assert helpers._clients['cluster'] == (owned, True)
+    external = FakeClient()
+    register_client(external, 'cluster')
+    assert get_client('cluster') is external
+    close_clients()
+    assert owned.status == 'closed' and external.status == 'running'
+    # a dead owned client is closed before being replaced
+    dead = get_client('cluster')
+    dead.status = 'closing_gracefully'
+    assert get_client('cluster') is not dead
+    assert dead.status == 'closed'
+    close_clients()
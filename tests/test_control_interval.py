@@ -0,0 +1,37 @@
+import numpy as np
+from scipy import stats
+
+from hotelling.plots import control_interval, control_intervals
+
+
+def reference_interval(m, n, f, phase, alpha):
+    if phase == 1:
+        dist, scale = stats.beta(f / 2, ((m - f - 1) / 2)), (m - 1) * (n - 1) / m
+    else:
+        dist, scale = stats.f(f, m - f), (f * (m - 1) * (m + 1)) / (m * (m - f))
+    return scale * dist.ppf(alpha / 2), scale * dist.ppf(0.5), scale * dist.ppf(1 - alpha / 2)
+
+
+def test_control_interval_reference():
+    for phase in (1, 2):
+        np.testing.assert_allclose(control_interval(200, 200, 6, phase=phase, alpha=0.01),
+                                   reference_interval(200, 200, 6, phase, 0.01), rtol=1e-12)
+
+
+def test_control_interval_cached():
+    control_interval.cache_clear()
+    control_interval(100, 100, 3)
+    control_interval(100, 100, 3)
+    assert control_interval.cache_info().hits == 1
+
+
+def test_control_intervals_vectorized():
+    m = np.asarray([50, 200, 1000, 50])
+    f = np.asarray([3, 6, 10, 3])
+    alpha = np.asarray([0.001, 0.01, 0.05, 0.01])
+    phase = np.asarray([1, 2, 1, 2])
+    lcl, cl, ucl = control_intervals(m, m, f, phase=phase, alpha=alpha)
+    assert lcl.shape == (4,)
+    for i in range(4):
+        np.testing.assert_allclose((lcl[i], cl[i], ucl[i]), reference_interval(m[i], m[i], f[i], phase[i], alpha[i]),
+                                   rtol=1e-12)
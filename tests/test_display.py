@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from hotelling.display import DisplayLevels, lttb_indices, minmax_indices
+from hotelling.plots import control_chart, display_levels
+
+
+@pytest.fixture
+def scores():
+    values = np.random.default_rng(0).chisquare(3, 100_003)
+    values[[17, 50_000, 99_990]] = [40.0, 50.0, 60.0]
+    return values
+
+
+def test_minmax_keeps_extremes(scores):
+    index = minmax_indices(scores, 1000)
+    assert len(index) <= 1000
+    assert scores[index].max() == scores.max()
+    assert scores[index].min() == scores.min()
+    np.testing.assert_array_equal(minmax_indices(scores[:500], 1000), np.arange(500))
+
+
+def test_lttb(scores):
+    index = lttb_indices(scores, 500)
+    assert len(index) == 500
+    assert index[0] == 0 and index[-1] == len(scores) - 1
+    assert np.all(np.diff(index) > 0)
+    # a spike is the largest triangle of its bucket
+    assert {17, 50_000, 99_990} <= set(index)
+
+
+@pytest.mark.parametrize("method", ["minmax", "lttb", "random"])
+def test_view_keeps_out_of_control(scores, method):
+    levels = DisplayLevels(scores, lcl=0.01, ucl=15.0)
+    index = levels.view(limit=1000, method=method, random_state=1)
+    assert set(levels.outliers) <= set(index)
+    assert len(index) <= 1000 + len(levels.outliers)
+    assert np.all(np.diff(index) > 0)
+
+
+def test_view_range(scores):
+    levels = DisplayLevels(scores, ucl=30.0)
+    assert len(levels.levels) > 3
+    index = levels.view(40_000, 60_000, limit=200)
+    assert index.min() >= 40_000 and index.max() < 60_000
+    assert 50_000 in index
+    assert len(index) <= 200 + 2
+    assert scores[index].min() == scores[40_000:60_000].min()
+    np.testing.assert_array_equal(levels.view(10, 300, limit=1000), np.arange(10, 300))
+    with pytest.raises(ValueError):
+        levels.view(method="sample")
+
+
+def test_control_chart_displays_all_out_of_control():
+    rng = np.random.default_rng(2)
+    x = pd.DataFrame(rng.standard_normal((20_000, 3)))
+    x.iloc[[123, 9_876, 19_000]] += 8
+    levels = display_levels(x, alpha=0.001)
+    assert levels.scores.shape == (20_000,)
+    assert {123, 9_876, 19_000} <= set(levels.outliers)
+    ax = control_chart(levels, no_display=True)
+    shown = ax.get_lines()[1].get_xdata()
+    assert {123, 9_876, 19_000} <= set(shown)
+    zoomed = control_chart(x, xlim=(9_000, 11_000), limit=100, no_display=True, display="lttb")
+    xdata = zoomed.get_lines()[0].get_xdata()
+    assert xdata.min() >= 9_000 and xdata.max() < 11_000
@@ -0,0 +1,101 @@
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from hotelling import helpers
+from hotelling.helpers import SNIFF_ROWS, load_df
+from hotelling.plots import control_stats
+from hotelling.stats import _iter_chunks, hotelling_t2, pooled_covariance_matrix
+
+
+def samples(n=20_000, p=4):
+    rng = np.random.default_rng(0)
+    # large offset, float32 sums of squares would lose most of the digits
+    x = 1e4 + rng.standard_normal((n, p))
+    y = 1e4 + 0.02 + rng.standard_normal((n, p))
+    return x, y
+
+
+def test_float32_accumulates_in_float64():
+    x, y = samples()
+    x32, y32 = x.astype(np.float32), y.astype(np.float32)
+    result = hotelling_t2(x32, y32, dtype=np.float32)
+    # same as float64 computations on the float32 observations
+    expected = hotelling_t2(x32.astype(float), y32.astype(float))
+    np.testing.assert_allclose(result[0], expected[0], rtol=1e-8)
+    np.testing.assert_allclose(result[3], expected[3], rtol=1e-8)
+    assert result[3].dtype == np.float64
+
+
+def test_dtype_casts_float64_samples():
+    x, y = samples(2_000, 3)
+    x32 = x.astype(np.float32).astype(float)
+    y32 = y.astype(np.float32).astype(float)
+    np.testing.assert_allclose(hotelling_t2(x, y, dtype=np.float32)[0], hotelling_t2(x32, y32)[0], rtol=1e-9)
+    np.testing.assert_allclose(
+        pooled_covariance_matrix(pd.DataFrame(x), pd.DataFrame(y), dtype="float32"),
+        pooled_covariance_matrix(x32, y32),
+        rtol=1e-9,
+    )
+    mean, cov = control_stats(pd.DataFrame(x, columns=list("abc")), dtype=np.float32)
+    np.testing.assert_allclose(cov.values, np.cov(x32, rowvar=False), rtol=1e-9)
+    assert list(mean.index) == list("abc")
+
+
+def test_chunks_are_float64():
+    x = np.arange(10, dtype=np.float32).reshape(5, 2)
+    chunks = list(_iter_chunks(pd.DataFrame(x), chunksize=2))
+    assert [chunk.dtype for chunk in chunks] == [np.float64] * 3
+    np.testing.assert_array_equal(np.vstack(chunks), x)
+
+
+def test_float32_memory():
+    x = np.random.default_rng(0).standard_normal((1_000_000, 5)).astype(np.float32)
+    tracemalloc.start()
+    try:
+        hotelling_t2(x, dtype=np.float32)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    # blocks of CHUNKSIZE rows, no float64 copy of the whole sample
+    assert peak < x.nbytes
+
+
+def test_load_df_dtype(tmp_path):
+    df = load_df('data/swiss_real.csv', dtype=np.float32)
+    assert set(df.dtypes) == {np.dtype(np.float32)}
+    path = tmp_path / "sample.csv"
+    pd.DataFrame({"id": ["a", "b"], "n": [1, 2], "x": [0.5, 1.5]}).to_csv(path, index=False)
+    df = load_df(str(path), index_col="id", dtype=np.float32)
+    assert list(df.index) == ["a", "b"]
+    assert df["n"].dtype == np.int64
+    assert df["x"].dtype == np.float32
+
+
+def test_load_df_dtype_while_reading(tmp_path, monkeypatch):
+    x = load_df('data/swiss_real.csv')
+    x.to_parquet(tmp_path / 'x.parquet')
+    x.to_feather(tmp_path / 'x.feather')
+    # converted before pandas, the float64 frame is never built
+    monkeypatch.setattr(helpers, "_cast", lambda df, dtype: df)
+    for name in ('x.parquet', 'x.feather'):
+        df = load_df(str(tmp_path / name), dtype=np.float32)
+        assert set(df.dtypes) == {np.dtype(np.float32)}
+        np.testing.assert_array_equal(df.values, x.values.astype(np.float32))
+    df = load_df(str(tmp_path / 'x.parquet'), columns=['p2', 'p5'], dtype=np.float32)
+    assert list(df.columns) == ['p2', 'p5'] and set(df.dtypes) == {np.dtype(np.float32)}
+    df = load_df('data/swiss_real.csv', dtype=np.float32)
+    assert set(df.dtypes) == {np.dtype(np.float32)}
+    np.testing.assert_array_equal(df.values, x.values.astype(np.float32))
+
+
+def test_load_df_dtype_csv_fallback(tmp_path):
+    path = tmp_path / "sample.csv"
+    n = SNIFF_ROWS + 10
+    # x: integers in the first rows, then floats, y: a number in the first rows only, both cast after reading
+    x = pd.Series([1] * SNIFF_ROWS + [1.5] * 10, dtype=object)
+    pd.DataFrame({"x": x, "y": ["0.5"] * (n - 1) + ["text"]}).to_csv(path, index=False)
+    df = load_df(str(path), dtype=np.float32)
+    assert df["x"].dtype == np.float32
+    assert df["y"].iloc[-1] == "text"
@@ -0,0 +1,42 @@
+import numpy as np
+
+from hotelling.helpers import load_df
+from hotelling.stats import CovarianceFactor, factorize, hotelling_t2, hotelling_t2_scores
+
+
+def test_factorize_cached():
+    x = load_df('data/swiss_real.csv')
+    s = x.cov()
+    factor = factorize(s)
+    assert factor.method == "cholesky"
+    assert factorize(s.copy()) is factor
+    assert factorize(factor) is factor
+    assert factorize(s * 2) is not factor
+    # keyed by content only, no labels of the first caller are kept
+    relabeled = s.rename(index=str.upper, columns=str.upper)
+    assert factorize(relabeled) is factor
+    assert not hasattr(factor, "columns")
+
+
+def test_factor_solve():
+    x = load_df('data/swiss_real.csv')
+    s = x.cov().values
+    b = np.arange(6.0)
+    np.testing.assert_allclose(CovarianceFactor(s).solve(b), np.linalg.solve(s, b))
+    np.testing.assert_allclose(CovarianceFactor(s).mahalanobis(b), b @ np.linalg.solve(s, b))
+
+
+def test_factor_singular():
+    s = np.asarray([[1.0, 1.0], [1.0, 1.0]])
+    factor = CovarianceFactor(s)
+    assert factor.method == "eigen"
+    b = np.asarray([1.0, 2.0])
+    np.testing.assert_allclose(factor.solve(b), np.linalg.pinv(s) @ b)
+
+
+def test_factor_in_place_of_s():
+    x = load_df('data/swiss_real.csv')
+    x_bar, s = x.mean(), x.cov()
+    factor = factorize(s)
+    assert hotelling_t2(x[:1], x_bar, S=factor) == hotelling_t2(x[:1], x_bar, S=s)
+    np.testing.assert_allclose(hotelling_t2_scores(x, x_bar, factor), hotelling_t2_scores(x, x_bar, s))
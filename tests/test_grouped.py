@@ -0,0 +1,80 @@
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from hotelling import stats
+from hotelling.helpers import load_df
+from hotelling.stats import hotelling_t2, hotelling_t2_grouped
+
+
+@pytest.fixture
+def swiss():
+    x = load_df('data/swiss_real.csv').assign(sample="real")
+    y = load_df('data/swiss_fake.csv').assign(sample="fake")
+    df = pd.concat([x, y], ignore_index=True)
+    df["site"] = df.index % 3
+    df["line"] = np.where(df.index % 2, "a", "b")
+    return df
+
+
+@pytest.mark.parametrize("bessel", [True, False])
+def test_grouped_matches_hotelling_t2(swiss, bessel):
+    res = hotelling_t2_grouped(swiss, by=["site", "line"], sample_col="sample", x_value="real", bessel=bessel,
+                               chunksize=50)
+    assert len(res) == 6
+    features = ["p1", "p2", "p3", "p4", "p5", "p6"]
+    for (site, line), row in res.iterrows():
+        group = swiss[(swiss.site == site) & (swiss.line == line)]
+        x = group[group["sample"] == "real"][features]
+        y = group[group["sample"] == "fake"][features]
+        expected = hotelling_t2(x, y, bessel=bessel)
+        assert row["nx"] == len(x)
+        np.testing.assert_allclose(row[["t2_stat", "f_stat", "p_value"]].astype(float), expected[:3], rtol=1e-8)
+
+
+def test_grouped_missing_sample(swiss):
+    swiss = swiss[~((swiss.site == 0) & (swiss["sample"] == "fake"))]
+    res = hotelling_t2_grouped(swiss, by="site", sample_col="sample")
+    assert list(res.index) == [1, 2]
+
+
+def test_grouped_needs_two_samples(swiss):
+    with pytest.raises(ValueError):
+        hotelling_t2_grouped(swiss[swiss["sample"] == "real"], by="site", sample_col="sample")
+
+
+def test_grouped_missing_keys(swiss):
+    expected = hotelling_t2_grouped(swiss, by="site", sample_col="sample")
+    swiss = pd.concat([swiss, swiss.iloc[:10].assign(site=np.nan), swiss.iloc[10:15].assign(sample=None)])
+    res = hotelling_t2_grouped(swiss, by="site", sample_col="sample")
+    # rows without a group or sample are not counted, as with groupby
+    pd.testing.assert_frame_equal(res.reset_index(drop=True), expected.reset_index(drop=True))
+    assert list(res.index) == [0, 1, 2]
+
+
+@pytest.mark.parametrize("small_cell", [1, 10_000])
+def test_grouped_comoment_paths(swiss, monkeypatch, small_cell):
+    # one product per cell, or batched outer products of small cells
+    monkeypatch.setattr(stats, "SMALL_CELL", small_cell)
+    res = hotelling_t2_grouped(swiss, by=["site", "line"], sample_col="sample", x_value="real", chunksize=20)
+    features = ["p1", "p2", "p3", "p4", "p5", "p6"]
+    for (site, line), row in res.iterrows():
+        group = swiss[(swiss.site == site) & (swiss.line == line)]
+        expected = hotelling_t2(group[group["sample"] == "real"][features], group[group["sample"] == "fake"][features])
+        np.testing.assert_allclose(row["t2_stat"], expected[0], rtol=1e-8)
+
+
+def test_grouped_memory():
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(rng.standard_normal((2000, 200)))
+    df["group"], df["sample"] = np.arange(2000) % 2, np.arange(2000) // 1000
+    tracemalloc.start()
+    try:
+        hotelling_t2_grouped(df, by="group", sample_col="sample")
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    # no (rows, p, p) tensor of outer products
+    assert peak < 10 * df.values.nbytes
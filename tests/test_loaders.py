@@ -0,0 +1,98 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from hotelling.helpers import _file_size, file_format, load_df, load_stats
+from hotelling.stats import hotelling_t2
+
+
+def test_file_format(tmp_path):
+    assert file_format('data/swiss_real.csv') == 'csv'
+    assert file_format('x.PARQUET') == 'parquet'
+    assert file_format('x.feather') == 'arrow'
+    assert file_format('x.npy') == 'npy'
+    assert file_format(tmp_path) == 'parquet'
+
+
+def test_parquet_columns(tmp_path):
+    x = load_df('data/swiss_real.csv')
+    path = tmp_path / 'swiss.parquet'
+    x.to_parquet(path)
+    columns = list(x.columns[:3])
+    df = load_df(path, columns=columns)
+    assert list(df.columns) == columns
+    pd.testing.assert_frame_equal(df, x[columns])
+    ddf = load_df(path, dask=True, columns=columns)
+    assert hasattr(ddf, 'to_delayed')
+    np.testing.assert_allclose(ddf.compute().values, x[columns].values)
+    acc = load_stats(path, chunksize=17, columns=columns)
+    np.testing.assert_allclose(acc.cov(), x[columns].cov())
+
+
+def test_parquet_directory_size(tmp_path):
+    x = load_df('data/swiss_real.csv')
+    path = tmp_path / 'swiss'
+    (path / 'year=2020').mkdir(parents=True)
+    x.iloc[:50].to_parquet(path / 'part.0.parquet')
+    x.iloc[50:].to_parquet(path / 'year=2020' / 'part.1.parquet')
+    files = [path / 'part.0.parquet', path / 'year=2020' / 'part.1.parquet']
+    # dask is used over 2GB, from the total size of the files, not of the directory entry
+    assert _file_size(str(path)) == sum(os.path.getsize(f) for f in files)
+    assert _file_size('data/swiss_real.csv') == os.path.getsize('data/swiss_real.csv')
+
+
+def test_parquet_index_col(tmp_path):
+    x = load_df('data/shoes.csv', index_col='Subject')
+    path = tmp_path / 'shoes.parquet'
+    x.reset_index().to_parquet(path, index=False)
+    df = load_df(path, index_col='Subject')
+    pd.testing.assert_frame_equal(df, x)
+    acc = load_stats(path, chunksize=3, index_col='Subject')
+    assert acc.columns == list(x.columns)
+    np.testing.assert_allclose(acc.mean, x.mean())
+
+
+def test_feather_memory_mapped(tmp_path):
+    x = load_df('data/swiss_real.csv')
+    y = load_df('data/swiss_fake.csv')
+    x.to_feather(tmp_path / 'x.feather')
+    y.to_feather(tmp_path / 'y.feather')
+    fx = load_df(tmp_path / 'x.feather')
+    fy = load_df(tmp_path / 'y.feather')
+    pd.testing.assert_frame_equal(fx, x)
+    assert round(hotelling_t2(fx, fy)[0], 4) == 2412.4507
+    assert list(load_df(tmp_path / 'x.feather', columns=['p2', 'p5']).columns) == ['p2', 'p5']
+    # more rows than a default record batch, written as a single batch: the dataframe views the mapped file
+    big = pd.DataFrame(np.random.default_rng(0).standard_normal((200_000, 4)), columns=list('abcd'))
+    big.to_feather(tmp_path / 'big.feather', compression='uncompressed', chunksize=len(big))
+    allocated = pa.total_allocated_bytes()
+    df = load_df(tmp_path / 'big.feather')
+    projected = load_df(tmp_path / 'big.feather', columns=['b', 'd'])
+    assert pa.total_allocated_bytes() - allocated < 1024
+    np.testing.assert_array_equal(df.values, big.values)
+    np.testing.assert_array_equal(projected.values, big[['b', 'd']].values)
+
+
+def test_npy_memory_mapped(tmp_path):
+    x = load_df('data/swiss_real.csv').values
+    np.save(tmp_path / 'x.npy', x)
+    df = load_df(tmp_path / 'x.npy')
+    np.testing.assert_array_equal(df.values, x)
+    assert list(load_df(tmp_path / 'x.npy', columns=[1, 2]).columns) == [1, 2]
+    np.testing.assert_array_equal(load_df(tmp_path / 'x.npy', columns=[4, 0]).values, x[:, [4, 0]])
+    df = load_df(tmp_path / 'x.npy', columns=[-1])
+    assert list(df.columns) == [5]
+    np.testing.assert_array_equal(df.values, x[:, [-1]])
+    np.testing.assert_array_equal(load_df(tmp_path / 'x.npy', columns=[-2, -1]).values, x[:, -2:])
+    with pytest.raises(ValueError):
+        load_df(tmp_path / 'x.npy', columns=[6])
+    np.testing.assert_allclose(load_stats(tmp_path / 'x.npy', chunksize=11).cov(), np.cov(x, rowvar=False))
+
+
+def test_csv_columns():
+    df = load_df('data/shoes.csv', index_col='Subject', columns=['Comfort', 'Cushion'])
+    assert list(df.columns) == ['Comfort', 'Cushion']
+    assert df.index.name == 'Subject'
@@ -0,0 +1,54 @@
+import numpy as np
+
+from hotelling.helpers import load_df
+from hotelling.monitor import MCUSUM, mcusum_limit
+from hotelling.plots import control_stats
+
+
+def naive_mcusum(x, x_bar, s, k):
+    inv = np.linalg.pinv(s)
+    state = np.zeros(len(x_bar))
+    res = []
+    for row in x:
+        d = state + row - x_bar
+        c = np.sqrt(d @ inv @ d)
+        state = np.zeros(len(x_bar)) if c <= k else d * (1 - k / c)
+        res.append(np.sqrt(state @ inv @ state))
+    return np.asarray(res)
+
+
+def test_mcusum_limit_crosier_table():
+    # Crosier (1988), p=2, k=0.5, h=5.5 for an in-control ARL of about 200
+    assert abs(mcusum_limit(2, 0.5, 200) - 5.5) < 0.2
+
+
+def test_mcusum_matches_recursion():
+    x = load_df('data/swiss_real.csv')
+    y = load_df('data/swiss_fake.csv').values
+    x_bar, s = control_stats(x)
+    chart = MCUSUM(x_bar, s, k=0.5, ucl=20.0)
+    stats, ooc = chart.run(y, chunksize=9)
+    np.testing.assert_allclose(stats, naive_mcusum(y, x_bar.values, s.values, 0.5))
+    np.testing.assert_array_equal(ooc, stats > 20.0)
+
+
+def test_mcusum_streaming_equals_batch():
+    x = load_df('data/swiss_real.csv')
+    y = np.concatenate([x.values, load_df('data/swiss_fake.csv').values])
+    batch, ooc = MCUSUM.from_baseline(x, k=1.0, ucl=8.0).run(y)
+    chart = MCUSUM.from_baseline(x, k=1.0, ucl=8.0)
+    streamed = np.concatenate([chart.update(row)[0] for row in y])
+    np.testing.assert_allclose(streamed, batch)
+    assert not ooc[:50].any() and ooc[100:].any()
+
+
+def test_mcusum_singular_covariance():
+    x = load_df('data/swiss_real.csv')
+    y = load_df('data/swiss_fake.csv').values
+    # constant feature, S is singular, observations are whitened to its rank
+    x["constant"], y = 1.0, np.column_stack([y, np.ones(len(y))])
+    x_bar, s = control_stats(x)
+    chart = MCUSUM(x_bar, s, k=0.5, ucl=20.0)
+    assert chart.rank == chart.state.shape[0] == 6
+    stats, _ = chart.run(y, chunksize=9)
+    np.testing.assert_allclose(stats, naive_mcusum(y, x_bar.values, s.values, 0.5), rtol=1e-6)
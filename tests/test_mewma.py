@@ -0,0 +1,53 @@
+import numpy as np
+
+from hotelling.helpers import load_df
+from hotelling.monitor import MEWMA, mewma_limit
+from hotelling.plots import control_stats
+
+
+def naive_mewma(x, x_bar, s, lam):
+    z = np.zeros(len(x_bar))
+    inv = np.linalg.pinv(lam / (2 - lam) * s)
+    res = []
+    for row in x:
+        z = lam * (row - x_bar) + (1 - lam) * z
+        res.append(z @ inv @ z)
+    return np.asarray(res)
+
+
+def test_mewma_limit_lowry_table():
+    # Lowry et al. (1992), p=2, λ=0.1, ARL0=200: h=8.66
+    assert abs(mewma_limit(2, 0.1, 200) - 8.66) < 0.25
+
+
+def test_mewma_matches_recursion():
+    x = load_df('data/swiss_real.csv')
+    y = load_df('data/swiss_fake.csv').values
+    x_bar, s = control_stats(x)
+    chart = MEWMA(x_bar, s, lam=0.2, ucl=15.0)
+    stats, ooc = chart.run(y, chunksize=7)
+    np.testing.assert_allclose(stats, naive_mewma(y, x_bar.values, s.values, 0.2))
+    np.testing.assert_array_equal(ooc, stats > 15.0)
+
+
+def test_mewma_streaming_equals_batch():
+    x = load_df('data/swiss_real.csv')
+    y = load_df('data/swiss_fake.csv').values
+    batch = MEWMA.from_baseline(x, ucl=10.0).run(y)[0]
+    chart = MEWMA.from_baseline(x, ucl=10.0)
+    streamed = np.concatenate([chart.update(y[i:i + 3])[0] for i in range(0, len(y), 3)])
+    np.testing.assert_allclose(streamed, batch)
+    chart.reset()
+    np.testing.assert_allclose(chart.update(y[0])[0], batch[:1])
+
+
+def test_mewma_singular_covariance():
+    x = load_df('data/swiss_real.csv')
+    y = load_df('data/swiss_fake.csv').values
+    # constant feature, S is singular, observations are whitened to its rank
+    x["constant"], y = 1.0, np.column_stack([y, np.ones(len(y))])
+    x_bar, s = control_stats(x)
+    chart = MEWMA(x_bar, s, lam=0.2, ucl=20.0)
+    assert chart.rank == chart.state.shape[0] == 6
+    stats, _ = chart.run(y, chunksize=9)
+    np.testing.assert_allclose(stats, naive_mewma(y, x_bar.values, s.values, 0.2), rtol=1e-6)
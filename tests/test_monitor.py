@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+
+from hotelling.helpers import load_df
+from hotelling.monitor import RollingT2, T2Monitor
+from hotelling.plots import control_interval, control_stats
+from hotelling.stats import hotelling_t2
+
+
+def test_monitor_from_baseline():
+    x = load_df('data/swiss_real.csv')
+    y = load_df('data/swiss_fake.csv')
+    monitor = T2Monitor.from_baseline(x, alpha=0.01)
+    x_bar, s = control_stats(x)
+    assert (monitor.lcl, monitor.cl, monitor.ucl) == control_interval(len(x), len(x), 6, phase=2, alpha=0.01)
+    t2, ooc = monitor.score(y)
+    expected = [hotelling_t2(y[i:i + 1], x_bar, S=s) for i in range(len(y))]
+    np.testing.assert_allclose(t2, expected)
+    np.testing.assert_array_equal(ooc, (t2 > monitor.ucl) | (t2 < monitor.lcl))
+    assert ooc.sum() > 50
+
+
+def test_monitor_single_observation():
+    x = load_df('data/swiss_real.csv')
+    monitor = T2Monitor(*control_stats(x), m=len(x))
+    t2, ooc = monitor.score(x.values[0])
+    assert t2.shape == ooc.shape == (1,)
+    np.testing.assert_allclose(t2, monitor.score(x.values[:3])[0][:1])
+
+
+def test_rolling_t2_matches_recomputed_window():
+    x = load_df('data/swiss_real.csv').values
+    window = 50
+    rolling = RollingT2(window, alpha=0.01)
+    t2, ooc = rolling.update(x[:window + 40])
+    assert np.isnan(t2[:window]).all()
+    for i in range(window, window + 40):
+        baseline = x[i - window:i]
+        expected = hotelling_t2(x[i:i + 1], baseline.mean(0), S=np.cov(baseline, rowvar=False))
+        np.testing.assert_allclose(t2[i], expected)
+    t2_next, _ = rolling.update(x[window + 40])
+    baseline = x[40:window + 40]
+    expected = hotelling_t2(x[window + 40:window + 41], baseline.mean(0), S=np.cov(baseline, rowvar=False))
+    np.testing.assert_allclose(t2_next[0], expected)
+    lcl, _, ucl = control_interval(window, window, 6, phase=2, alpha=0.01)
+    np.testing.assert_array_equal(ooc[window:], (t2[window:] > ucl) | (t2[window:] < lcl))
+
+
+def test_rolling_t2_refresh():
+    x = load_df('data/swiss_real.csv').values
+    a, b = RollingT2(50), RollingT2(50, refresh=7)
+    np.testing.assert_allclose(a.update(x)[0], b.update(x)[0])
+
+
+def test_rolling_t2_window_larger_than_features():
+    x = load_df('data/swiss_real.csv').values
+    with pytest.raises(ValueError):
+        RollingT2(6).update(x[:10])
+    with pytest.raises(ValueError):
+        RollingT2(1)
+
+
+def test_rolling_t2_indefinite_update_recomputes():
+    rng = np.random.default_rng(0)
+    x = rng.standard_normal((30, 3))
+    rolling = RollingT2(20)
+    rolling.update(x[:20])
+    # drifted co-moment matrix, the downdate can't be factorized, the window is recomputed instead
+    rolling.comoment = np.zeros((3, 3))
+    rolling.update(x[20])
+    baseline = x[1:21]
+    np.testing.assert_allclose(rolling.mean, baseline.mean(0))
+    np.testing.assert_allclose(rolling.factor.lower @ rolling.factor.lower.T, np.cov(baseline, rowvar=False) * 19)
+    np.testing.assert_array_equal(np.asarray(rolling.buffer), baseline)
+
+
+def test_rolling_t2_constant_feature():
+    x = load_df('data/swiss_real.csv').values.copy()
+    x[:, 2] = 1.0
+    window = 30
+    rolling = RollingT2(window)
+    t2, _ = rolling.update(x[:window + 20])
+    assert rolling.factor.method == "eigen"
+    for i in range(window, window + 20):
+        baseline = x[i - window:i]
+        # pseudo-inverse of the singular covariance
+        expected = hotelling_t2(x[i:i + 1], baseline.mean(0), S=np.cov(baseline, rowvar=False))
+        np.testing.assert_allclose(t2[i], expected)
@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from hotelling.helpers import load_df
+from hotelling.stats import CovarianceFactor, hotelling_t2, pooled_covariance_matrix
+
+
+@pytest.fixture
+def swiss():
+    return load_df('data/swiss_real.csv'), load_df('data/swiss_fake.csv')
+
+
+def check_same(result, expected):
+    np.testing.assert_allclose(result[:3], expected[:3], rtol=1e-10)
+    np.testing.assert_allclose(np.asarray(result[3]), np.asarray(expected[3]), rtol=1e-10)
+
+
+@pytest.mark.parametrize("bessel", [True, False])
+def test_two_sample_kernel(swiss, bessel):
+    x, y = swiss
+    check_same(hotelling_t2(x.values, y.values, bessel), hotelling_t2(x, y, bessel))
+    check_same(hotelling_t2(x.values.tolist(), y.values.tolist(), bessel), hotelling_t2(x, y, bessel))
+    np.testing.assert_allclose(
+        pooled_covariance_matrix(x.values, y.values, bessel), pooled_covariance_matrix(x, y, bessel), rtol=1e-10
+    )
+
+
+def test_one_sample_kernel(swiss):
+    x, _ = swiss
+    mu = list(x.mean() + 0.1)
+    check_same(hotelling_t2(x.values), hotelling_t2(x))
+    check_same(hotelling_t2(x.values, mu), hotelling_t2(x, np.array(mu)))
+    check_same(hotelling_t2(x.values, mu, approximation="chi2"), hotelling_t2(x, np.array(mu), approximation="chi2"))
+    S = x.cov().values
+    assert hotelling_t2(x.values, mu, S=S) == pytest.approx(hotelling_t2(x, np.array(mu), S=CovarianceFactor(S)))
+
+
+def test_kernel_errors(swiss):
+    x, y = swiss
+    with pytest.raises(ValueError):
+        hotelling_t2(x.values, y.values[:, :3])
+    with pytest.raises(ValueError):
+        hotelling_t2(x.values, [0.0, 1.0])
+    with pytest.raises(ValueError):
+        hotelling_t2(x.values, y.values, approximation="t")
+
+
+def test_mixed_numpy_pandas(swiss):
+    x, y = swiss
+    check_same(hotelling_t2(x.values, y), hotelling_t2(x, y))
+    assert isinstance(hotelling_t2(x)[3], pd.DataFrame)
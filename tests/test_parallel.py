@@ -0,0 +1,55 @@
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from hotelling.helpers import load_df
+from hotelling.parallel import attach, parallel_stats, row_ranges, shared_array, shared_memory
+from hotelling.stats import hotelling_t2, pooled_covariance_matrix
+
+pytestmark = pytest.mark.skipif(shared_memory is None, reason="multiprocessing.shared_memory is not available")
+
+
+def test_row_ranges():
+    assert row_ranges(10, 3) == [(0, 3), (3, 6), (6, 10)]
+    assert row_ranges(2, 4) == [(0, 1), (1, 2)]
+
+
+def test_parallel_stats():
+    x = np.random.default_rng(0).normal(size=(10_001, 4))
+    acc = parallel_stats(x, workers=3, chunksize=1000)
+    assert acc.shape == x.shape
+    np.testing.assert_allclose(acc.mean, x.mean(0))
+    np.testing.assert_allclose(acc.cov(), np.cov(x, rowvar=False))
+
+
+def test_hotelling_t2_workers():
+    x = load_df('data/swiss_real.csv')
+    y = load_df('data/swiss_fake.csv')
+    res = hotelling_t2(x, y, workers=2)
+    expected = hotelling_t2(x, y)
+    np.testing.assert_allclose(res[:3], expected[:3])
+    np.testing.assert_allclose(res[3], expected[3])
+    np.testing.assert_allclose(pooled_covariance_matrix(x, y, workers=2), expected[3])
+
+
+def test_hotelling_t2_workers_one_sample():
+    x = load_df('data/shoes.csv', index_col='Subject')
+    res = hotelling_t2(x.values, np.asarray([7, 8, 5, 7, 9]), workers=2)
+    assert round(res[0], 4) == 52.6724  # T2
+    assert round(res[2], 5) == 0.00016  # P-value
+
+
+def test_shared_array_no_intermediate_copy():
+    df = pd.DataFrame(np.random.default_rng(0).normal(size=(400_000, 5)).astype(np.float32))
+    tracemalloc.start()
+    try:
+        with shared_array(df) as block, attach(*block) as values:
+            np.testing.assert_array_equal(values[::1000], df.values[::1000])
+            _, peak = tracemalloc.get_traced_memory()
+            del values
+    finally:
+        tracemalloc.stop()
+    # shared memory is not traced, only the float64 blocks of CHUNKSIZE rows
+    assert peak < df.shape[0] * df.shape[1] * 8 / 2
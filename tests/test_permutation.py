@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from hotelling.helpers import load_df
+from hotelling.parallel import shared_memory
+from hotelling.resampling import permutation_test
+from hotelling.stats import hotelling_t2
+
+
+def naive_permutations(x, y, n_permutations, seed):
+    rng = np.random.default_rng(seed)
+    pooled = np.concatenate([x, y])
+    observed = hotelling_t2(x, y)[0]
+    count = 0
+    for _ in range(n_permutations):
+        idx = rng.permutation(len(pooled))
+        count += hotelling_t2(pooled[idx[:len(x)]], pooled[idx[len(x):]])[0] >= observed * (1 - 1e-10)
+    return (count + 1) / (n_permutations + 1)
+
+
+def test_permutation_statistic():
+    x = load_df('data/swiss_real.csv')
+    y = load_df('data/swiss_fake.csv')
+    t2, p_value = permutation_test(x, y, n_permutations=99, random_state=0)
+    assert round(t2, 4) == 2412.4507
+    assert p_value == 0.01
+
+
+def test_permutation_null():
+    rng = np.random.default_rng(1)
+    x, y = rng.normal(size=(30, 3)), rng.normal(size=(20, 3))
+    _, p_value = permutation_test(x, y, n_permutations=400, random_state=2)
+    # same distribution as computing every permuted T2 with hotelling_t2
+    assert abs(p_value - naive_permutations(x, y, 400, 3)) < 0.1
+    assert abs(p_value - hotelling_t2(x, y)[2]) < 0.1
+
+
+def test_permutation_reproducible():
+    rng = np.random.default_rng(1)
+    x, y = rng.normal(size=(30, 3)), rng.normal(0.3, size=(20, 3))
+    res = permutation_test(x, y, n_permutations=250, random_state=5, task_size=100)
+    assert res == permutation_test(x, y, n_permutations=250, random_state=5, task_size=100)
+    if shared_memory is not None:
+        assert res == permutation_test(x, y, n_permutations=250, random_state=5, task_size=100, workers=2)
+
+
+def test_hotelling_t2_permutations():
+    rng = np.random.default_rng(1)
+    x, y = rng.normal(size=(30, 3)), rng.normal(0.3, size=(20, 3))
+    res = hotelling_t2(x, y, permutations=200, random_state=5)
+    np.testing.assert_allclose(res[0], hotelling_t2(x, y)[0])
+    assert res[2] == permutation_test(x, y, 200, random_state=5)[1]
+    with pytest.raises(ValueError):
+        hotelling_t2(x, permutations=200)
+
+
+def test_hotelling_t2_permutations_covariance_dtype():
+    rng = np.random.default_rng(1)
+    x, y = rng.normal(size=(30, 3)), rng.normal(0.3, size=(20, 3))
+    for covariance in ("ledoit_wolf", "oas"):
+        with pytest.raises(ValueError):
+            hotelling_t2(x, y, permutations=200, covariance=covariance)
+    res = hotelling_t2(x, y, permutations=200, random_state=5, dtype=np.float32)
+    x32, y32 = x.astype(np.float32), y.astype(np.float32)
+    np.testing.assert_allclose(res[0], hotelling_t2(x32, y32, dtype=np.float32)[0])
+    assert res[2] == permutation_test(x32, y32, 200, random_state=5)[1]
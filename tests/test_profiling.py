@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+
+from hotelling import profiling
+from hotelling.helpers import load_df
+from hotelling.plots import control_chart
+from hotelling.profiling import add_callback, profile, remove_callback, stage
+from hotelling.stats import hotelling_t2
+
+
+def test_disabled_by_default():
+    assert profiling._callbacks == []
+    with stage("anything", np.zeros(3)) as st:
+        st.data(np.zeros(3))
+    assert st is profiling._NO_STAGE
+
+
+def test_hotelling_t2_stages():
+    x = load_df('data/swiss_real.csv')
+    y = load_df('data/swiss_fake.csv')
+    with profile() as prof:
+        hotelling_t2(x, y)
+    assert profiling._callbacks == []
+    report = prof.report()
+    assert list(report.index) == [
+        "hotelling_t2",
+        "hotelling_t2/means",
+        "hotelling_t2/pooled_covariance_matrix",
+        "hotelling_t2/solve",
+        "hotelling_t2/p_value",
+    ]
+    assert report.loc["hotelling_t2/means", "calls"] == 2
+    assert report.loc["hotelling_t2", "rows"] == len(x) + len(y)
+    assert report.loc["hotelling_t2", "nbytes"] == x.values.nbytes + y.values.nbytes
+    assert report.loc["hotelling_t2", "seconds"] >= report.loc["hotelling_t2/solve", "seconds"]
+    assert np.isnan(report.loc["hotelling_t2/solve", "rows"])
+
+
+def test_shrinkage_and_load_df_stages():
+    with profile() as prof:
+        x = load_df('data/swiss_real.csv')
+        hotelling_t2(x, covariance="ledoit_wolf")
+    paths = [record.path for record in prof.records]
+    assert "load_df/read" in paths
+    assert "hotelling_t2/sufficient_stats" in paths
+    assert "hotelling_t2/covariance" in paths
+    read = prof.records[paths.index("load_df/read")]
+    assert read.rows == len(x)
+
+
+def test_control_chart_stages():
+    x = pd.DataFrame(np.random.default_rng(0).standard_normal((2000, 3)))
+    records = []
+    add_callback(records.append)
+    try:
+        control_chart(x, no_display=True)
+    finally:
+        remove_callback(records.append)
+    paths = {record.path: record for record in records}
+    # T2 of all the rows, reduced for display
+    assert paths["control_chart/t2_scores"].rows == len(x)
+    assert paths["control_chart/display"].rows == len(x)
+    assert "control_chart/control_stats" in paths
+    assert "control_chart/control_interval" in paths
+    assert records[-1].path == "control_chart"
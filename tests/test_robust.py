@@ -0,0 +1,61 @@
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from hotelling.helpers import load_df
+from hotelling.plots import control_chart, control_stats
+from hotelling.robust import _sample_rows, fast_mcd
+from hotelling.stats import hotelling_t2
+
+
+def contaminated(n, p=3, fraction=0.1, seed=0):
+    rng = np.random.default_rng(seed)
+    x = rng.standard_normal((n, p))
+    x[:int(n * fraction)] += 8
+    return pd.DataFrame(x, columns=[f"x{i}" for i in range(p)])
+
+
+def test_fast_mcd_ignores_outliers():
+    x = contaminated(500, seed=1)
+    x_bar, s = fast_mcd(x, random_state=0)
+    assert list(s.columns) == list(x.columns)
+    assert np.abs(x_bar).max() < 0.2
+    np.testing.assert_allclose(s, np.eye(3), atol=0.15)
+    # the sample estimates are pulled by the outliers
+    assert (x.mean() > 0.5).all()
+
+
+def test_fast_mcd_large_subsets_workers():
+    x = contaminated(20000, seed=1).values
+    x_bar, s = fast_mcd(x, n_trials=100, random_state=0, chunksize=3000)
+    assert isinstance(x_bar, np.ndarray)
+    assert np.abs(x_bar).max() < 0.1
+    np.testing.assert_allclose(s, np.eye(3), atol=0.1)
+    again = fast_mcd(x, n_trials=100, random_state=0, workers=2)
+    np.testing.assert_allclose(x_bar, again[0])
+    np.testing.assert_allclose(s, again[1])
+
+
+def test_fast_mcd_clean_data_close_to_sample():
+    x = load_df('data/swiss_real.csv')
+    x_bar, s = control_stats(x, robust=True, random_state=0)
+    np.testing.assert_allclose(x_bar, x.mean(), rtol=0.05)
+    assert hotelling_t2(x, x_bar.values, S=s) >= 0
+    control_chart(x, x_bar=x_bar, s=s, no_display=True)
+
+
+def test_sample_rows_converts_only_the_sample():
+    x = pd.DataFrame(np.random.default_rng(0).standard_normal((1_000_000, 5)).astype(np.float32))
+    tracemalloc.start()
+    try:
+        sample = _sample_rows(x, len(x), 1_500, np.random.default_rng(1))
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert sample.shape == (1_500, 5) and sample.dtype == np.float64
+    # no float64 copy of the whole frame
+    assert peak < x.values.nbytes / 2
+    rows = np.sort(np.random.default_rng(1).choice(len(x), 1_500, replace=False))
+    np.testing.assert_array_equal(sample, x.values[rows])
+    np.testing.assert_array_equal(_sample_rows(x.values, len(x), 1_500, np.random.default_rng(1)), sample)
@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+
+from hotelling.helpers import load_df
+from hotelling.plots import control_stats
+from hotelling.stats import (
+    CovarianceFactor, SufficientStats, hotelling_t2, pooled_covariance_matrix, shrinkage_intensity
+)
+
+
+def ledoit_wolf(x):
+    # reference implementation, on the whole centered sample
+    n, p = x.shape
+    centered = x - x.mean(0)
+    emp = centered.T @ centered / n
+    mu = np.trace(emp) / p
+    delta = ((emp - mu * np.identity(p)) ** 2).sum() / p
+    squares = centered ** 2
+    beta = (np.sum(squares.T @ squares) / n - (emp ** 2).sum()) / (p * n)
+    return min(beta, delta) / delta
+
+
+def test_merged_fourth_moments():
+    x = load_df('data/swiss_real.csv').values
+    acc = SufficientStats().update(x[:30]).merge(SufficientStats().update(x[30:90])).merge(SufficientStats.from_data(x[90:]))
+    centered = x - x.mean(0)
+    norms = (centered ** 2).sum(1)
+    np.testing.assert_allclose(acc.third, norms @ centered, atol=1e-6)
+    np.testing.assert_allclose(acc.fourth, norms @ norms)
+
+
+def test_ledoit_wolf_intensity():
+    rng = np.random.default_rng(0)
+    x = rng.standard_normal((40, 100)) * np.linspace(1, 3, 100)
+    acc = SufficientStats.from_data(x, chunksize=7)
+    intensity = shrinkage_intensity(acc.comoment, acc.n, acc.fourth)
+    assert 0 < intensity < 1
+    np.testing.assert_allclose(intensity, ledoit_wolf(x))
+    oas = shrinkage_intensity(acc.comoment, acc.n, covariance="oas")
+    assert 0 < oas <= 1
+    with pytest.raises(ValueError):
+        shrinkage_intensity(acc.comoment, acc.n, covariance="unknown")
+
+
+def test_more_features_than_observations():
+    rng = np.random.default_rng(1)
+    x = rng.standard_normal((30, 80))
+    y = rng.standard_normal((25, 80)) + 0.5
+    for covariance in ("ledoit_wolf", "oas"):
+        t2, f_value, p_value, s = hotelling_t2(x, y, covariance=covariance)
+        assert np.isfinite(t2) and t2 > 0
+        assert CovarianceFactor(s).method == "cholesky"
+        np.testing.assert_allclose(s, pooled_covariance_matrix(x, y, covariance=covariance))
+        t2_one = hotelling_t2(x, covariance=covariance)[0]
+        assert np.isfinite(t2_one)
+    with pytest.raises(ValueError):
+        hotelling_t2(x, y, covariance="unknown")
+
+
+def test_shrinkage_control_stats():
+    x = load_df('data/swiss_real.csv')
+    x_bar, s = control_stats(x, covariance="oas")
+    np.testing.assert_allclose(x_bar, x.mean())
+    assert list(s.columns) == list(x.columns)
+    sample = x.cov().values
+    # same trace, smaller off diagonal terms
+    np.testing.assert_allclose(np.trace(s), np.trace(sample))
+    off = ~np.eye(len(s), dtype=bool)
+    assert (np.abs(s.values[off]) <= np.abs(sample[off]) + 1e-12).all()
+
+
+def test_shrinkage_pooled_covariance_labeled():
+    x = load_df('data/swiss_real.csv')
+    y = load_df('data/swiss_fake.csv')
+    for covariance in ("sample", "ledoit_wolf", "oas"):
+        s = pooled_covariance_matrix(x, y, covariance=covariance)
+        assert list(s.index) == list(s.columns) == list(x.columns)
+        assert isinstance(pooled_covariance_matrix(x.values, y.values, covariance=covariance), np.ndarray)
+    np.testing.assert_allclose(pooled_covariance_matrix(x, y, dtype=np.float64), pooled_covariance_matrix(x, y))
@@ -0,0 +1,27 @@
+import numpy as np
+
+from hotelling.helpers import load_df, load_stats, stream_hotelling_dict, stream_hotelling_t2
+from hotelling.stats import hotelling_dict
+
+
+def test_load_stats():
+    x = load_df('data/swiss_real.csv')
+    acc = load_stats('data/swiss_real.csv', chunksize=32)
+    assert acc.shape == x.shape
+    assert acc.columns == list(x.columns)
+    np.testing.assert_allclose(acc.cov(), x.cov())
+
+
+def test_stream_one_sample():
+    res = stream_hotelling_t2('data/shoes.csv', np.asarray([7, 8, 5, 7, 9]), chunksize=4, index_col='Subject')
+    assert round(res[0], 4) == 52.6724  # T2
+    assert round(res[1], 4) == 8.7787  # F
+    assert round(res[2], 5) == 0.00016  # P-value
+
+
+def test_stream_two_sample():
+    res = stream_hotelling_dict('data/swiss_real.csv', 'data/swiss_fake.csv', chunksize=25)
+    expected = hotelling_dict(load_df('data/swiss_real.csv'), load_df('data/swiss_fake.csv'))
+    assert round(res["t2_stat"], 4) == round(expected["t2_stat"], 4) == 2412.4507
+    assert round(res["f_stat"], 4) == 391.9217
+    np.testing.assert_allclose(res["pooled_var"], expected["pooled_var"])
@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from hotelling.helpers import load_df
+from hotelling.stats import SufficientStats, hotelling_t2, hotelling_dict, pooled_covariance_matrix
+
+
+def test_update_matches_numpy():
+    x = load_df('data/swiss_real.csv')
+    acc = SufficientStats.from_data(x, chunksize=13)
+    assert acc.shape == x.shape
+    np.testing.assert_allclose(acc.mean, x.mean())
+    np.testing.assert_allclose(acc.cov(), x.cov())
+    np.testing.assert_allclose(acc.sums, x.sum())
+
+
+def test_merge_partitions():
+    x = load_df('data/swiss_real.csv').values
+    acc = SufficientStats().update(x[:50]).merge(SufficientStats().update(x[50:120])).merge(SufficientStats.from_data(x[120:]))
+    np.testing.assert_allclose(acc.mean, x.mean(0))
+    np.testing.assert_allclose(acc.cov(ddof=0), np.cov(x, rowvar=False, ddof=0))
+
+
+def test_merge_different_features():
+    with pytest.raises(ValueError):
+        SufficientStats().update(np.ones((3, 2))).merge(SufficientStats().update(np.ones((3, 3))))
+
+
+def test_one_sample_from_stats():
+    x = load_df('data/shoes.csv', index_col='Subject')
+    res = hotelling_t2(SufficientStats.from_data(x), np.asarray([7, 8, 5, 7, 9]))
+    assert round(res[0], 4) == 52.6724  # T2
+    assert round(res[1], 4) == 8.7787  # F
+    assert round(res[2], 5) == 0.00016  # P-value
+
+
+def test_two_sample_from_stats():
+    x = load_df('data/swiss_real.csv')
+    y = load_df('data/swiss_fake.csv')
+    res = hotelling_dict(SufficientStats.from_data(x, chunksize=17), SufficientStats.from_data(y))
+    assert round(res["t2_stat"], 4) == 2412.4507
+    assert round(res["f_stat"], 4) == 391.9217
+    np.testing.assert_allclose(res["pooled_var"], pooled_covariance_matrix(x, y))
+
+
+def test_two_sample_from_stats_no_bessel():
+    x = np.asarray([[23, 45, 15], [40, 85, 18], [215, 307, 60], [110, 110, 50], [65, 105, 24]])
+    y = np.asarray([[277, 230, 63], [153, 80, 29], [306, 440, 105], [252, 350, 175], [143, 205, 42]])
+    res = hotelling_t2(SufficientStats.from_data(x), SufficientStats.from_data(y), bessel=False)
+    assert round(res[0], 4) == 11.1037  # T2
+    assert round(res[1], 4) == 2.2207  # F
+    assert round(res[2], 5) == 0.17337
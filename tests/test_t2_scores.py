@@ -0,0 +1,32 @@
+import numpy as np
+
+from hotelling.helpers import load_df
+from hotelling.stats import hotelling_t2, hotelling_t2_scores
+
+
+def test_scores_match_row_by_row():
+    x = load_df('data/swiss_real.csv')
+    x_bar, s = x.mean(), x.cov()
+    expected = [hotelling_t2(x[i:i + 1], x_bar, S=s) for i in range(len(x))]
+    res = hotelling_t2_scores(x, x_bar, s)
+    np.testing.assert_allclose(res, expected)
+
+
+def test_scores_chunksize():
+    x = load_df('data/swiss_real.csv')
+    x_bar, s = x.mean(), x.cov()
+    np.testing.assert_allclose(hotelling_t2_scores(x, x_bar, s, chunksize=7), hotelling_t2_scores(x, x_bar, s))
+
+
+def test_scores_dask():
+    x = load_df('data/swiss_real.csv')
+    y = load_df('data/swiss_real.csv', dask=True)
+    x_bar, s = x.mean(), x.cov()
+    np.testing.assert_allclose(hotelling_t2_scores(y, x_bar, s), hotelling_t2_scores(x, x_bar, s))
+
+
+def test_scores_singular_covariance():
+    x = np.asarray([[1.0, 2.0, 3.0], [2.0, 4.0, 6.0], [3.0, 6.5, 9.5], [4.0, 8.0, 12.0]])
+    x_bar, s = x.mean(0), np.cov(x, rowvar=False)
+    expected = [d @ np.linalg.pinv(s) @ d for d in x - x_bar]
+    np.testing.assert_allclose(hotelling_t2_scores(x, x_bar, s), expected, atol=1e-8)